@@ -8,13 +8,52 @@ from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_restful import Api
 
-from app.models import User, RegularUser, EditorUser, AdminUser, Content, Comment
-from app.resources.comment_resources import CommentListResource, CommentResource
-from .resources.content_resources import ContentListResource, ContentResource
-from .resources.auth_resources import UserRegisterResource, UserLoginResource
-from .resources.user_resources import UserListResource, UserResource
+from app.models import (
+    User,
+    RegularUser,
+    EditorUser,
+    AdminUser,
+    Content,
+    ContentChunk,
+    Comment,
+    OutboxEvent,
+    AuthInvalidation,
+    TokenRevocation,
+    RefreshToken,
+)
+from app.resources.comment_resources import (
+    CommentListResource,
+    CommentResource,
+    ContentCommentListResource,
+)
+from .resources.content_resources import (
+    ContentChangesResource,
+    ContentListResource,
+    ContentResource,
+)
+from .resources.auth_resources import (
+    TokenRefreshResource,
+    TokenRevokeResource,
+    UserLoginResource,
+    UserRegisterResource,
+)
+from .resources.user_resources import (
+    UserBulkResource,
+    UserListResource,
+    UserResource,
+)
+from .resources.metrics_resources import MetricsResource
+from .services.auth_cache import AUTH_CACHE as auth_cache
 from .services.limiter import LIMITER as limiter
+from .services.outbox import OUTBOX_RELAY as outbox_relay
+from .services.passwords import PASSWORDS as passwords
+from .services.tokens import TOKEN_REVOCATIONS as token_revocations
+from .commands.content_commands import CONTENTS_CLI
+from .commands.outbox_commands import OUTBOX_CLI
+from .commands.schema_commands import SCHEMA_CLI
 from .extensions import DB as db
+from .middlewares.authorization import load_active_user, reject_inactive_user
+from .middlewares.entities import forget_loaded_entities
 from .resources.api_response import Response
 
 
@@ -23,21 +62,39 @@ def create_app():
     """Create a Flask application."""
     app = Flask(__name__)
     CORS(app)
-    JWTManager(app)
+    jwt = JWTManager(app)
+    jwt.user_lookup_loader(load_active_user)
+    jwt.user_lookup_error_loader(reject_inactive_user)
+    app.teardown_request(forget_loaded_entities)
     Bcrypt(app)
     api = Api(app)
     api.add_resource(ContentListResource, "/contents")
+    api.add_resource(ContentChangesResource, "/contents/changes")
     api.add_resource(ContentResource, "/contents/<string:content_id>")
+    api.add_resource(
+        ContentCommentListResource, "/contents/<string:content_id>/comments"
+    )
     api.add_resource(CommentListResource, "/comments")
     api.add_resource(CommentResource, "/comments/<string:comment_id>")
     api.add_resource(UserListResource, "/users")
+    api.add_resource(UserBulkResource, "/users/bulk")
     api.add_resource(UserResource, "/users/<string:user_id>")
     api.add_resource(UserRegisterResource, "/register")
     api.add_resource(UserLoginResource, "/login")
+    api.add_resource(TokenRefreshResource, "/token/refresh")
+    api.add_resource(TokenRevokeResource, "/token/revoke")
+    api.add_resource(MetricsResource, "/metrics")
     app.config.from_object("config.Config")
 
     db.init_app(app)
     limiter.init_app(app)
+    outbox_relay.init_app(app)
+    auth_cache.init_app(app)
+    token_revocations.init_app(app)
+    passwords.init_app(app)
+    app.cli.add_command(OUTBOX_CLI)
+    app.cli.add_command(CONTENTS_CLI)
+    app.cli.add_command(SCHEMA_CLI)
 
     @app.errorhandler(Exception)
     def handle_exception(e):
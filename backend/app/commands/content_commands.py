@@ -0,0 +1,68 @@
+"""Flask CLI commands to operate on the content corpus."""
+
+import click
+from flask.cli import AppGroup
+
+from ..extensions import DB as db
+from ..models.content import Content, make_excerpt
+from ..services.producer import PRODUCER
+from ..services.reindex import Reindexer
+
+CONTENTS_CLI = AppGroup("contents", help="Operate on the content corpus.")
+
+
+@CONTENTS_CLI.command("reindex")
+@click.option("--batch-size", type=int, default=500, show_default=True)
+@click.option("--workers", type=int, default=4, show_default=True)
+@click.option(
+    "--rate", type=float, default=0, help="Maximum events per second, 0 for no cap."
+)
+@click.option("--updated-since", type=click.DateTime(), default=None)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    default="instance/reindex.checkpoint",
+    show_default=True,
+)
+@click.option("--resume", is_flag=True, help="Continue from the checkpoint.")
+# pylint: disable=too-many-arguments
+def reindex_command(batch_size, workers, rate, updated_since, checkpoint, resume):
+    """Publish a create event for every live content."""
+    reindexer = Reindexer(
+        PRODUCER,
+        batch_size=batch_size,
+        workers=workers,
+        rate=rate,
+        checkpoint_path=checkpoint,
+        updated_since=updated_since,
+    )
+    if resume and reindexer.resume():
+        click.echo(f"Resuming after content {reindexer.last_id}.")
+    with click.progressbar(length=reindexer.count(), label="Reindexing") as progress:
+        published = reindexer.run(on_progress=progress.update)
+    click.echo(f"Published {published} events.")
+
+
+@CONTENTS_CLI.command("excerpts")
+@click.option("--batch-size", type=int, default=500, show_default=True)
+def excerpts_command(batch_size):
+    """Store the excerpt of every content that has none yet."""
+    updated = 0
+    last_id = ""
+    while True:
+        rows = db.session.execute(
+            db.select(Content.id, Content.body)
+            .where(Content.excerpt == "", Content.id > last_id)
+            .order_by(Content.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(
+            db.update(Content),
+            [{"id": row.id, "excerpt": make_excerpt(row.body)} for row in rows],
+        )
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    click.echo(f"Stored {updated} excerpts.")
@@ -0,0 +1,37 @@
+"""Flask CLI commands to operate the content event outbox."""
+
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+
+from ..services.outbox import OUTBOX_RELAY, prune_outbox_events, replay_outbox_events
+
+OUTBOX_CLI = AppGroup("outbox", help="Operate the content event outbox.")
+
+
+@OUTBOX_CLI.command("relay")
+def relay_command():
+    """Run the outbox relay in the foreground."""
+    click.echo("Relaying outbox events, press CTRL+C to stop.")
+    OUTBOX_RELAY.run()
+
+
+@OUTBOX_CLI.command("drain")
+def drain_command():
+    """Publish every pending outbox event once and exit."""
+    click.echo(f"Published {OUTBOX_RELAY.drain()} events.")
+
+
+@OUTBOX_CLI.command("replay")
+@click.option("--since", type=click.DateTime(), required=True)
+def replay_command(since):
+    """Publish again every event created since the given time."""
+    click.echo(f"Queued {replay_outbox_events(since)} events for replay.")
+
+
+@OUTBOX_CLI.command("prune")
+@click.option("--older-than-days", type=int, default=7, show_default=True)
+def prune_command(older_than_days):
+    """Delete published events older than the given number of days."""
+    before = datetime.now() - timedelta(days=older_than_days)
+    click.echo(f"Deleted {prune_outbox_events(before)} events.")
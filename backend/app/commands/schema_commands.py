@@ -0,0 +1,21 @@
+"""Flask CLI commands to upgrade the schema of an existing database."""
+
+import click
+from flask.cli import AppGroup
+
+from ..services.schema import pending_schema_changes, upgrade_schema
+
+SCHEMA_CLI = AppGroup("schema", help="Upgrade the database schema.")
+
+
+@SCHEMA_CLI.command("upgrade")
+@click.option(
+    "--dry-run", is_flag=True, help="Print the statements instead of running them."
+)
+def upgrade_command(dry_run):
+    """Add the columns and indexes missing from tables of earlier versions."""
+    statements = pending_schema_changes() if dry_run else upgrade_schema()
+    for statement in statements:
+        click.echo(f"{statement.strip()};")
+    if not statements:
+        click.echo("The schema is up to date.")
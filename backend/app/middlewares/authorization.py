@@ -1,9 +1,72 @@
-"""Middleware to verify that the JWT is valid and the user is active."""
+"""Request-scoped identity shared by every middleware and resource.
+
+The access token of a request is verified once, by ``jwt_required`` or by
+the first middleware that needs it, and Flask-JWT-Extended loads the
+authorization record of its user (id, role and whether it is active) once
+through ``load_active_user``, from the process-wide ``AUTH_CACHE``. With
+``JWT_ROLE_CLAIMS`` enabled, tokens carry the role and token version of
+their user instead, and the record is built from the claims once
+``TOKEN_REVOCATIONS`` confirms the version was not revoked.
+Middlewares and resources then read the same identity from
+``get_current_user`` and ``get_current_user_id``.
+"""
 
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from flask import abort
-from app.models.user import User
+from flask import current_app
+from flask_jwt_extended import (
+    get_current_user as get_loaded_user,
+    get_jwt,
+    get_jwt_identity,
+    verify_jwt_in_request,
+)
+
+from app.resources.api_response import Response
+from app.services.auth_cache import AUTH_CACHE, AuthRecord
+from app.services.tokens import TOKEN_REVOCATIONS
+
+
+def load_active_user(_jwt_header, jwt_data):
+    """User lookup callback returning the record of a token's user unless deleted."""
+    user_id = jwt_data[current_app.config["JWT_IDENTITY_CLAIM"]]
+    if current_app.config["JWT_ROLE_CLAIMS"] and "ver" in jwt_data:
+        # Deleting a user or changing its role revokes its tokens.
+        if TOKEN_REVOCATIONS.is_revoked(user_id, jwt_data["ver"]):
+            return None
+        return AuthRecord(user_id, jwt_data["role"], True)
+    record = AUTH_CACHE.get(user_id)
+    if record is None or not record.active:
+        return None
+    return record
+
+
+def reject_inactive_user(_jwt_header, _jwt_data):
+    """User lookup error callback for tokens of missing or deleted users."""
+    response = Response(
+        message="Unable to authenticate",
+        error="Invalid or missing authentication token.",
+        status=401,
+    )
+    return response.to_dict(), 401
+
+
+def verify_identity():
+    """Verify the token of the request unless it already was."""
+    try:
+        get_jwt()
+    except RuntimeError:
+        verify_jwt_in_request()
+
+
+def get_current_user_id():
+    """Return the id of the authenticated user."""
+    verify_identity()
+    return get_jwt_identity()
+
+
+def get_current_user():
+    """Return the authorization record of the authenticated, active user."""
+    verify_identity()
+    return get_loaded_user()
 
 
 def verify_active_user(f):
@@ -11,11 +74,6 @@ def verify_active_user(f):
 
     @wraps(f)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.deleted_at is not None:
-            abort(401, description="Invalid or missing authentication token.")
-        return f(current_user, *args, **kwargs)
+        return f(get_current_user(), *args, **kwargs)
 
     return wrapper
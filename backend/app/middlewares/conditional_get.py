@@ -0,0 +1,75 @@
+"""Conditional GET handling for reads of a single entity.
+
+``conditional_get`` computes the validators of the entity handed over by
+``with_entity`` before the handler runs: a strong ETag hashing the stored
+columns of the entity, anything else its representation depends on and the
+query string, and a Last-Modified date. When the request's
+``If-None-Match`` (or, without it, ``If-Modified-Since``) shows the client
+already has that representation, a ``304`` is returned without running the
+handler, so nothing is serialized.
+"""
+
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import current_app, request
+from werkzeug.http import http_date, quote_etag
+
+
+def row_fingerprint(entity):
+    """Return the stored column values of an entity."""
+    return [getattr(entity, column.key) for column in entity.__table__.columns]
+
+
+def entity_validators(entity):
+    """Return the parts of the ETag of an entity and when it last changed."""
+    return row_fingerprint(entity), entity.updated_at
+
+
+def is_not_modified(etag, last_modified):
+    """Return whether the client already has the representation."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_get(name, cache_control_setting, validators=entity_validators):
+    """Decorator answering conditional GETs on the entity passed as ``name``.
+
+    ``validators`` returns the parts of the ETag and the Last-Modified time
+    of the entity; ``cache_control_setting`` names the setting holding the
+    Cache-Control header of its responses.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            entity = kwargs.get(name)
+            if entity is None:
+                return f(*args, **kwargs)
+            parts, last_modified = validators(entity)
+            etag = hashlib.blake2b(
+                repr((sorted(request.args.items(multi=True)), parts)).encode("utf-8"),
+                digest_size=16,
+            ).hexdigest()
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0).astimezone(
+                    timezone.utc
+                )
+            headers = {
+                "ETag": quote_etag(etag),
+                "Cache-Control": current_app.config[cache_control_setting],
+                "Vary": "Authorization",
+            }
+            if last_modified is not None:
+                headers["Last-Modified"] = http_date(last_modified)
+            if is_not_modified(etag, last_modified):
+                return current_app.response_class(status=304, headers=headers)
+            body, status = f(*args, **kwargs)
+            return body, status, headers if status == 200 else {}
+
+        return wrapper
+
+    return decorator
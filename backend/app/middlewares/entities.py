@@ -0,0 +1,45 @@
+"""Request-scoped loading of the entities a route operates on.
+
+Middlewares checking access to an entity and the resource handling the
+request both need the entity named by a view argument. ``load_entity``
+loads it once per request, and ``with_entity`` hands it to the handler as
+a keyword argument, so the handler works on the entity the middlewares
+already checked instead of querying it again.
+"""
+
+from functools import wraps
+from flask import g
+
+
+def load_entity(model, entity_id):
+    """Return the live (not deleted) entity of a model, loading it once per request."""
+    loaded = g.setdefault("loaded_entities", {})
+    key = (model, entity_id)
+    if key not in loaded:
+        loaded[key] = model.query.filter(
+            model.deleted_at.is_(None), model.id == entity_id
+        ).first()
+    return loaded[key]
+
+
+def forget_loaded_entities(_exception=None):
+    """Teardown callback dropping the entities loaded by a request."""
+    g.pop("loaded_entities", None)
+
+
+def with_entity(model, id_arg, name):
+    """Decorator passing the live entity named by the view argument ``id_arg``.
+
+    The handler receives it as the keyword argument ``name``, in place of
+    the view argument, or None when there is no such entity.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            kwargs[name] = load_entity(model, kwargs.pop(id_arg))
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -11,8 +11,8 @@ def is_own_comment(f):
 
     @wraps(f)
     def wrapper(*args, **kwargs):
-        current_user_id, comment = get_comment_and_user(**kwargs)
-        if comment.user_id == current_user_id:
+        current_user, comment = get_comment_and_user(**kwargs)
+        if comment.user_id == current_user.id:
             return f(*args, **kwargs)
         abort(403, description="Access restricted to the user.")
 
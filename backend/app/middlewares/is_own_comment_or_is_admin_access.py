@@ -3,7 +3,6 @@
 from functools import wraps
 from flask import abort
 
-from app.models.user import User
 from app.services.comment_services import get_comment_and_user
 
 
@@ -12,9 +11,8 @@ def is_own_comment_or_accessed_by_admin(f):
 
     @wraps(f)
     def wrapper(*args, **kwargs):
-        current_user_id, comment = get_comment_and_user(**kwargs)
-        current_user = User.query.get(current_user_id)
-        if comment.user_id == current_user_id or current_user.role == "admin":
+        current_user, comment = get_comment_and_user(**kwargs)
+        if comment.user_id == current_user.id or current_user.role == "admin":
             return f(*args, **kwargs)
         abort(403, description="Access restricted to the user or admin.")
 
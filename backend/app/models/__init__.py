@@ -2,7 +2,12 @@
 
 from .user import User, RegularUser, EditorUser, AdminUser
 from .content import Content
+from .content_chunk import ContentChunk
 from .comment import Comment
+from .outbox import OutboxEvent
+from .auth_invalidation import AuthInvalidation
+from .token_revocation import TokenRevocation
+from .refresh_token import RefreshToken
 
 __all__ = [
     "User",
@@ -10,5 +15,10 @@ __all__ = [
     "EditorUser",
     "AdminUser",
     "Content",
+    "ContentChunk",
     "Comment",
+    "OutboxEvent",
+    "AuthInvalidation",
+    "TokenRevocation",
+    "RefreshToken",
 ]
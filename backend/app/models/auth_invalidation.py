@@ -0,0 +1,25 @@
+"""Model announcing changes of authorization data to every worker."""
+
+from datetime import datetime
+from ..extensions import DB as db
+
+
+# pylint: disable=too-few-public-methods
+class AuthInvalidation(db.Model):
+    """Record that the role or status of a user changed."""
+
+    __tablename__ = "auth_invalidations"
+    __table_args__ = {"extend_existing": True}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(
+        db.DateTime, default=datetime.now, nullable=False, index=True
+    )
+
+    def __init__(self, user_id):
+        """Initialize an invalidation."""
+        self.user_id = user_id
+
+    def __repr__(self):
+        return f"<AuthInvalidation {self.user_id}>"
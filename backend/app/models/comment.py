@@ -12,14 +12,22 @@ class Comment(db.Model):
     """Comment model representing user comments on content."""
 
     __tablename__ = "comments"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index(
+            "ix_comments_content_id_deleted_at_created_at",
+            "content_id",
+            "deleted_at",
+            "created_at",
+        ),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     user_id = db.Column(db.String(100), db.ForeignKey("users.id"), nullable=False)
     content_id = db.Column(db.String(100), db.ForeignKey("contents.id"), nullable=False)
     comment_text = db.Column(db.String(1000), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
     deleted_at = db.Column(db.DateTime, nullable=True)
 
     def __init__(self, user_id, content_id, comment_text):
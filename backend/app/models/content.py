@@ -3,23 +3,46 @@
 # pylint: disable=unused-import
 from datetime import datetime
 from uuid import uuid4
-from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
+from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow import fields
+from sqlalchemy.orm import validates
 from ..extensions import DB as db
 from .comment import Comment
 
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(body):
+    """Return the first words of a body, at most EXCERPT_LENGTH characters."""
+    text = " ".join(body.split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    cut = text[: EXCERPT_LENGTH - 3]
+    if " " in cut:
+        cut = cut[: cut.rindex(" ")]
+    return cut + "..."
+
 
 class Content(db.Model):
     """Content Model"""
 
     __tablename__ = "contents"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("ix_contents_updated_at_id", "updated_at", "id"),
+        db.Index(
+            "ix_contents_deleted_at_created_at_id", "deleted_at", "created_at", "id"
+        ),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     body = db.Column(db.String(5000), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
+    excerpt = db.Column(
+        db.String(EXCERPT_LENGTH), default="", server_default="", nullable=False
+    )
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
     deleted_at = db.Column(db.DateTime, nullable=True)
 
     # Add relationship to comments
@@ -28,6 +51,14 @@ class Content(db.Model):
         backref="content",
         lazy="dynamic",
     )
+    # Comments that are not deleted, for serialization
+    live_comments = db.relationship(
+        "Comment",
+        primaryjoin="and_(Content.id == Comment.content_id, "
+        "Comment.deleted_at.is_(None))",
+        order_by="(Comment.created_at, Comment.id)",
+        viewonly=True,
+    )
 
     def __init__(self, title, body):
         """Method to initialize a content"""
@@ -35,16 +66,19 @@ class Content(db.Model):
         self.title = title
         self.body = body
 
+    @validates("body")
+    def validate_body(self, _key, body):
+        """Keep the excerpt in step with the body whenever the body is set"""
+        self.excerpt = make_excerpt(body)
+        return body
+
     def to_dict(self):
         """Method to return a dictionary of the model"""
-        short_content = (
-            self.content[:50] + "..." if len(self.content) > 50 else self.content
-        )
         return {
             "id": self.id,
             "title": self.title,
             "body": self.body,
-            "short_content": short_content,
+            "short_content": self.excerpt,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
             "deleted_at": self.deleted_at,
@@ -61,7 +95,14 @@ class Content(db.Model):
 class ContentSchema(SQLAlchemyAutoSchema):
     """Content Schema"""
 
-    comments = fields.Nested("CommentSchema", many=True, exclude=("content",))
+    comments = fields.Nested(
+        "CommentSchema",
+        many=True,
+        exclude=("content",),
+        attribute="live_comments",
+        dump_only=True,
+    )
+    excerpt = auto_field(dump_only=True)
 
     class Meta:
         """Meta class for Content Schema"""
@@ -0,0 +1,28 @@
+"""Model of the passages a content body is split into."""
+
+from ..extensions import DB as db
+
+
+# pylint: disable=too-few-public-methods
+class ContentChunk(db.Model):
+    """Passage of a content body, identified by the hash of its text."""
+
+    __tablename__ = "content_chunks"
+    __table_args__ = {"extend_existing": True}
+
+    content_id = db.Column(
+        db.String(100), db.ForeignKey("contents.id"), primary_key=True
+    )
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hash = db.Column(db.String(32), nullable=False, index=True)
+    text = db.Column(db.Text, nullable=False)
+
+    def __init__(self, content_id, position, chunk_hash, text):
+        """Initialize a chunk."""
+        self.content_id = content_id
+        self.position = position
+        self.hash = chunk_hash
+        self.text = text
+
+    def __repr__(self):
+        return f"<ContentChunk {self.content_id}:{self.position}>"
@@ -0,0 +1,29 @@
+"""Outbox model holding change events until they reach the message queue."""
+
+from datetime import datetime
+from ..extensions import DB as db
+
+
+# pylint: disable=too-few-public-methods
+class OutboxEvent(db.Model):
+    """Event written in the same transaction as the change it describes."""
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        db.Index("ix_outbox_events_published_at_id", "published_at", "id"),
+        {"extend_existing": True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    aggregate_id = db.Column(db.String(100), nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    published_at = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, aggregate_id, payload):
+        """Initialize an outbox event."""
+        self.aggregate_id = aggregate_id
+        self.payload = payload
+
+    def __repr__(self):
+        return f"<OutboxEvent {self.id}>"
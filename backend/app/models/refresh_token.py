@@ -0,0 +1,30 @@
+"""Model tracking the refresh tokens issued to users."""
+
+from datetime import datetime
+from ..extensions import DB as db
+
+
+# pylint: disable=too-few-public-methods
+class RefreshToken(db.Model):
+    """Refresh token, usable once before being rotated."""
+
+    __tablename__ = "refresh_tokens"
+    __table_args__ = {"extend_existing": True}
+
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False, index=True)
+    family = db.Column(db.String(36), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    used_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, jti, user_id, family, expires_at):
+        """Initialize a refresh token."""
+        self.jti = jti
+        self.user_id = user_id
+        self.family = family
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"<RefreshToken {self.jti}>"
@@ -0,0 +1,27 @@
+"""Model recording that the access tokens of a user were revoked."""
+
+from datetime import datetime
+from ..extensions import DB as db
+
+
+# pylint: disable=too-few-public-methods
+class TokenRevocation(db.Model):
+    """Tokens of the user with a version below ``token_version`` are revoked."""
+
+    __tablename__ = "token_revocations"
+    __table_args__ = {"extend_existing": True}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    token_version = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(
+        db.DateTime, default=datetime.now, nullable=False, index=True
+    )
+
+    def __init__(self, user_id, token_version):
+        """Initialize a revocation."""
+        self.user_id = user_id
+        self.token_version = token_version
+
+    def __repr__(self):
+        return f"<TokenRevocation {self.user_id}:{self.token_version}>"
@@ -12,7 +12,11 @@ class User(db.Model):
     """Users model"""
 
     __tablename__ = "users"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("ix_users_deleted_at_id", "deleted_at", "id"),
+        db.Index("ix_users_last_name", "last_name"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -23,10 +27,11 @@ class User(db.Model):
     phone_number = db.Column(db.String(20), nullable=True)
     status = db.Column(db.Boolean, default=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.now(), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
     deleted_at = db.Column(db.DateTime, nullable=True)
     role = db.Column(db.String(50), nullable=False)
+    token_version = db.Column(db.Integer, default=0, server_default="0", nullable=False)
 
     # pylint: disable=too-many-arguments
     def __init__(
@@ -50,6 +55,7 @@ class User(db.Model):
         self.email = email
         self.phone_number = phone_number
         self.role = role
+        self.token_version = 0
 
 
 class RegularUser(User):
@@ -138,7 +144,7 @@ class UserSchema(SQLAlchemyAutoSchema):
 
         model = User
         load_instance = True
-        exclude = ("password_hash",)
+        exclude = ("password_hash", "token_version")
 
 
 class RegularUserSchema(UserSchema):
@@ -1,15 +1,19 @@
 """Definition of the resources for the authentication endpoints."""
 
-import base64
 from flask import request
-from flask_jwt_extended import create_access_token
-from bcrypt import checkpw
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
 
 from app.utils.user_factory import create_user_instance
 from ..models.user import RegularUserSchema, User
 from ..extensions import DB as db
 from ..models.user import UserSchema
 from ..services.limiter import LIMITER as limiter
+from ..services.passwords import PASSWORDS, PasswordServiceBusy
+from ..services.tokens import (
+    issue_tokens,
+    revoke_refresh_tokens,
+    use_refresh_token,
+)
 from .base_resource import BaseResource
 
 USER_SCHEMA = UserSchema()
@@ -28,7 +32,12 @@ class UserRegisterResource(BaseResource):
                 error="User with this username already exists",
                 status=400,
             )
-        new_user = create_user_instance(data)
+        try:
+            new_user = create_user_instance(data)
+        except PasswordServiceBusy as e:
+            return self.make_response(
+                message="Unable to register user", error=str(e), status=503
+            )
         db.session.add(new_user)
         db.session.commit()
         user_schema = RegularUserSchema()
@@ -46,16 +55,66 @@ class UserLoginResource(BaseResource):
     def post(self):
         """Method to login a user"""
         data = request.get_json()
-        user = User.query.filter_by(username=data["username"]).first()
+        user = User.query.filter(
+            User.deleted_at.is_(None), User.username == data["username"]
+        ).first()
         if user:
-            password_bytes = data["password"].encode("utf-8")
-            stored_hash = base64.b64decode(user.password_hash.encode("utf-8"))
-            if checkpw(password_bytes, stored_hash):
-                access_token = create_access_token(identity=user.id)
+            try:
+                verified = PASSWORDS.verify(data["password"], user.password_hash)
+            except PasswordServiceBusy as e:
                 return self.make_response(
-                    payload={"access_token": access_token},
+                    message="Unable to Login", error=str(e), status=503
+                )
+            if verified and PASSWORDS.needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = PASSWORDS.hash(data["password"])
+                except PasswordServiceBusy:
+                    # Keep the old hash; a later login upgrades it.
+                    pass
+            if verified:
+                tokens = issue_tokens(user)
+                db.session.commit()
+                return self.make_response(
+                    payload=tokens,
                     message="Logged In Successfully",
                 )
         return self.make_response(
             message="Unable to Login", error="Invalid credentials", status=401
         )
+
+
+class TokenRefreshResource(BaseResource):
+    """Resource to exchange a refresh token for new tokens"""
+
+    @limiter.limit("30 per minute")
+    @jwt_required(refresh=True)
+    def post(self):
+        """Method to rotate a refresh token"""
+        claims = get_jwt()
+        user = User.query.filter(
+            User.deleted_at.is_(None), User.id == get_jwt_identity()
+        ).first()
+        if user is None or not use_refresh_token(claims["jti"]):
+            db.session.commit()
+            return self.make_response(
+                message="Unable to refresh token",
+                error="Invalid or revoked refresh token",
+                status=401,
+            )
+        tokens = issue_tokens(user, claims["family"])
+        db.session.commit()
+        return self.make_response(
+            payload=tokens,
+            message="Token refreshed successfully",
+        )
+
+
+class TokenRevokeResource(BaseResource):
+    """Resource to revoke a refresh token"""
+
+    @jwt_required(refresh=True)
+    def post(self):
+        """Method to revoke a refresh token and the tokens rotated from it"""
+        revoke_refresh_tokens(get_jwt()["family"])
+        db.session.commit()
+        return self.make_response(message="Token revoked successfully")
@@ -2,15 +2,25 @@
 
 from datetime import datetime
 from flask import request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 
+from app.middlewares.authorization import get_current_user_id
+from app.middlewares.entities import with_entity
 from app.middlewares.is_own_comment import is_own_comment
 from app.middlewares.is_own_comment_or_is_admin_access import (
     is_own_comment_or_accessed_by_admin,
 )
+from app.utils.pagination import decode_cursor, get_cursor_pagination_info, get_per_page
 
 from ..models.comment import Comment, CommentSchema
+from ..models.content import Content
 from ..extensions import DB as db
+from ..services.comment_services import (
+    COMMENT_ORDERS,
+    CONTENT_COMMENTS_SCHEMA,
+    page_comments,
+)
+from ..services.limiter import LIMITER as limiter, list_budget
 from .base_resource import BaseResource
 
 COMMENT_SCHEMA = CommentSchema()
@@ -24,7 +34,7 @@ class CommentListResource(BaseResource):
     def post(self):
         """Create a new comment."""
         data = request.get_json()
-        current_user_id = get_jwt_identity()
+        current_user_id = get_current_user_id()
         data["user_id"] = current_user_id
         comment = Comment(**data)
         db.session.add(comment)
@@ -36,14 +46,57 @@ class CommentListResource(BaseResource):
         )
 
 
+class ContentCommentListResource(BaseResource):
+    """Resource to handle the comments of a content."""
+
+    @limiter.limit(list_budget, cost=get_per_page)
+    @jwt_required()
+    @with_entity(Content, "content_id", "content")
+    def get(self, content):
+        """Get a page of the live comments of a content.
+
+        ``order`` is ``oldest`` (the default) or ``newest`` first; the
+        ``cursor`` of a previous page keeps the order of that page.
+        """
+        if not content:
+            return self.make_response(
+                message="Unable to retrieve comments",
+                error="Content not found",
+                status=404,
+            )
+        order = request.args.get("order", "oldest")
+        after = None
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                order, *after = decode_cursor(cursor, str, datetime, str)
+            except ValueError:
+                order = None
+        if order not in COMMENT_ORDERS:
+            return self.make_response(
+                message="Unable to retrieve comments",
+                error="Invalid cursor" if cursor else "order must be oldest or newest",
+                status=400,
+            )
+        per_page = get_per_page()
+        comments, next_cursor = page_comments(content.id, order, per_page, after)
+        return self.make_response(
+            payload=CONTENT_COMMENTS_SCHEMA.dump(comments),
+            message="Comments retrieved successfully",
+            pagination=get_cursor_pagination_info(
+                next_cursor, next_cursor is not None, per_page, order=order
+            ),
+        )
+
+
 class CommentResource(BaseResource):
     """Resource to handle a single comment."""
 
     @jwt_required()
     @is_own_comment
-    def put(self, comment_id):
+    @with_entity(Comment, "comment_id", "comment")
+    def put(self, comment):
         """Update a comment."""
-        comment = Comment.query.filter_by(id=comment_id, deleted_at=None).first()
         if not comment:
             return self.make_response(
                 message="Unable to update comment",
@@ -61,9 +114,9 @@ class CommentResource(BaseResource):
 
     @jwt_required()
     @is_own_comment_or_accessed_by_admin
-    def delete(self, comment_id):
+    @with_entity(Comment, "comment_id", "comment")
+    def delete(self, comment):
         """Delete a comment."""
-        comment = Comment.query.filter_by(id=comment_id, deleted_at=None).first()
         if not comment:
             return self.make_response(
                 message="Unable to delete comment",
@@ -1,42 +1,274 @@
 """Definition of resources for the content endpoints."""
 
-from datetime import datetime
-import json
-from flask import request
+from datetime import datetime, timedelta
+from functools import lru_cache
+from flask import current_app, request
 from flask_jwt_extended import jwt_required
+from sqlalchemy.orm import load_only
 
-from app.utils.pagination import get_pagination_info
+from app.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    get_cursor_pagination_info,
+    get_pagination_info,
+    get_per_page,
+    count_items,
+    keyset_after,
+    TOTAL_MODES,
+)
+from ..models.comment import Comment
 from ..models.content import Content, ContentSchema
 from ..extensions import DB as db
-from ..services.producer import Producer
+from ..services.chunking import delete_chunks, store_chunks
+from ..services.comment_services import (
+    CONTENT_COMMENTS_SCHEMA,
+    first_comments,
+    page_comments,
+)
+from ..services.content_events import create_event, delete_event, update_event
+from ..services.limiter import LIMITER as limiter, list_budget, read_budget
+from ..services.outbox import OUTBOX_RELAY, add_outbox_event
 from .base_resource import BaseResource
+from ..middlewares.conditional_get import conditional_get, row_fingerprint
+from ..middlewares.entities import with_entity
 from ..middlewares.is_admin_or_editor import is_admin_or_editor
 
 CONTENT_SCHEMA = ContentSchema()
-CONTENTS_SCHEMA = ContentSchema(many=True)
-PRODUCER = Producer()
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+CONTENT_FIELDS = tuple(name for name in CONTENT_SCHEMA.fields if name != "comments")
+CONTENT_INCLUDES = ("comments",)
+SUMMARY_FIELDS = ("id", "title", "excerpt", "created_at", "updated_at")
+FULL_FIELDSET = frozenset(CONTENT_FIELDS + CONTENT_INCLUDES)
+
+
+def read_fieldset():
+    """Read the content fields a request asks for with ``fields`` and ``include``.
+
+    ``fields`` lists content attributes and ``include`` the related items to
+    embed. ``view=summary`` defaults them to SUMMARY_FIELDS and no related
+    items, ``view=full`` (the default) to every attribute and the comments.
+    Asking for ``fields`` without ``include`` embeds nothing. Raises
+    ValueError on unknown names.
+    """
+    view = request.args.get("view", "full")
+    if view not in ("full", "summary"):
+        raise ValueError("view must be one of full, summary")
+    summary = view == "summary"
+    fields = request.args.get("fields")
+    include = request.args.get(
+        "include", "" if summary or fields else ",".join(CONTENT_INCLUDES)
+    )
+    if fields:
+        only = set(fields.split(","))
+    else:
+        only = set(SUMMARY_FIELDS if summary else CONTENT_FIELDS)
+    included = set(filter(None, include.split(",")))
+    unknown = (only - set(CONTENT_FIELDS)) | (included - set(CONTENT_INCLUDES))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return frozenset(only | included)
+
+
+@lru_cache(maxsize=256)
+def content_schema(only, many=False):
+    """Return a schema dumping the ``only`` fields of contents."""
+    return ContentSchema(only=only, many=many)
+
+
+def with_fieldset(query, only):
+    """Load only the columns of contents that are dumped, or paged on.
+
+    Other columns, such as the body of a summary, stay deferred.
+    """
+    columns = [
+        getattr(Content, name)
+        for name in CONTENT_FIELDS
+        if name in only or name in ("id", "created_at")
+    ]
+    return query.options(load_only(*columns))
+
+
+def dump_content(content, only=FULL_FIELDSET):
+    """Dump a content with the ``only`` fields.
+
+    With comments, it embeds its first ``CONTENT_COMMENTS_EMBED_LIMIT`` live
+    comments and the ``comments_next_cursor`` to read the rest.
+    """
+    payload = content_schema(only - {"comments"}).dump(content)
+    if "comments" in only:
+        comments, next_cursor = page_comments(
+            content.id, "oldest", current_app.config["CONTENT_COMMENTS_EMBED_LIMIT"]
+        )
+        payload["comments"] = CONTENT_COMMENTS_SCHEMA.dump(comments)
+        payload["comments_next_cursor"] = next_cursor
+    return payload
+
+
+def dump_contents(contents, only):
+    """Dump a page of contents with the ``only`` fields.
+
+    With comments, each content embeds its first
+    ``CONTENT_COMMENTS_EMBED_LIMIT`` live comments, read for the whole page
+    in one query, and the ``comments_next_cursor`` to read the rest.
+    """
+    payload = content_schema(only - {"comments"}, many=True).dump(contents)
+    if "comments" in only and contents:
+        pages = first_comments(
+            [content.id for content in contents],
+            current_app.config["CONTENT_COMMENTS_EMBED_LIMIT"],
+        )
+        for item, content in zip(payload, contents):
+            comments, next_cursor = pages[content.id]
+            item["comments"] = CONTENT_COMMENTS_SCHEMA.dump(comments)
+            item["comments_next_cursor"] = next_cursor
+    return payload
+
+
+def content_cursor(direction, content):
+    """Return the cursor paging from a content towards ``next`` or ``prev``."""
+    return encode_cursor(direction, content.created_at, content.id)
+
+
+def key_after(created_at, content_id):
+    """Filter on contents after a (created_at, id) position."""
+    return keyset_after(Content.created_at, Content.id, created_at, content_id)
+
+
+def key_before(created_at, content_id):
+    """Filter on contents before a (created_at, id) position."""
+    return keyset_after(
+        Content.created_at, Content.id, created_at, content_id, descending=True
+    )
+
+
+def content_validators(content):
+    """Return what the representation of a content depends on and when it changed.
+
+    Besides its columns, that is the number of its comments and when they
+    were last updated or deleted, read in one aggregate query.
+    """
+    comments = db.session.execute(
+        db.select(
+            db.func.count(Comment.id),
+            db.func.max(Comment.updated_at),
+            db.func.max(Comment.deleted_at),
+        ).where(Comment.content_id == content.id)
+    ).one()
+    changes = [content.updated_at, *(time for time in comments[1:] if time)]
+    return [*row_fingerprint(content), *comments], max(changes)
+
+
+def change_to_dict(content, since):
+    """Describe a content in the change feed; deleted contents become tombstones."""
+    if content.deleted_at is not None:
+        return {
+            "op": "delete",
+            "id": content.id,
+            "deleted_at": content.deleted_at.isoformat(),
+        }
+    return {
+        "op": "create" if since is None or content.created_at > since else "update",
+        "id": content.id,
+        "title": content.title,
+        "body": content.body,
+        "created_at": content.created_at.isoformat(),
+        "updated_at": content.updated_at.isoformat(),
+    }
 
 
 class ContentListResource(BaseResource):
     """Resource to handle the content list."""
 
+    @limiter.limit(list_budget, cost=get_per_page)
     @jwt_required()
     def get(self):
-        """Method to get all contents."""
+        """Method to get all contents.
+
+        ``total`` chooses how ``total_items`` is computed: ``exact`` (the
+        default for pages), ``estimate`` or ``none`` (the default for
+        cursors). With ``cursor``, contents are paged by (created_at, id).
+        """
+        cursor_mode = "cursor" in request.args
+        total = request.args.get("total", "none" if cursor_mode else "exact")
+        if total not in TOTAL_MODES:
+            return self.make_response(
+                message="Unable to retrieve contents",
+                error=f"total must be one of {', '.join(TOTAL_MODES)}",
+                status=400,
+            )
+        try:
+            only = read_fieldset()
+        except ValueError as error:
+            return self.make_response(
+                message="Unable to retrieve contents", error=str(error), status=400
+            )
+        if cursor_mode:
+            return self.get_by_cursor(total, only)
         page = request.args.get("page", 1, type=int)
-        per_page = request.args.get("per_page", 15, type=int)
-        pagination_object = Content.query.filter(Content.deleted_at.is_(None)).paginate(
-            page=page, per_page=per_page
+        per_page = get_per_page()
+        query = Content.query.filter(Content.deleted_at.is_(None))
+        pagination_object = with_fieldset(query, only).paginate(
+            page=page, per_page=per_page, count=False
         )
+        pagination_object.total = count_items(query, "contents", total)
         contents = pagination_object.items
         pagination_info = get_pagination_info(pagination_object)
         return self.make_response(
-            payload=CONTENTS_SCHEMA.dump(contents),
+            payload=dump_contents(contents, only),
             message="Contents retrieved successfully",
             status=200,
             pagination=pagination_info,
         )
 
+    def get_by_cursor(self, total, only):
+        """Get a page of contents after or before a cursor, by (created_at, id)."""
+        per_page = get_per_page()
+        query = Content.query.filter(Content.deleted_at.is_(None))
+        count = count_items(query, "contents", total)
+        cursor = request.args.get("cursor")
+        direction = "next"
+        if cursor:
+            try:
+                direction, created_at, content_id = decode_cursor(
+                    cursor, str, datetime, str
+                )
+            except ValueError:
+                direction = None
+            if direction not in ("next", "prev"):
+                return self.make_response(
+                    message="Unable to retrieve contents",
+                    error="Invalid cursor",
+                    status=400,
+                )
+            query = query.filter(
+                key_after(created_at, content_id)
+                if direction == "next"
+                else key_before(created_at, content_id)
+            )
+        if direction == "next":
+            query = query.order_by(Content.created_at, Content.id)
+        else:
+            query = query.order_by(Content.created_at.desc(), Content.id.desc())
+        contents = with_fieldset(query, only).limit(per_page + 1).all()
+        more = len(contents) > per_page
+        contents = contents[:per_page]
+        if direction == "prev":
+            contents.reverse()
+        has_next = bool(contents) and (more if direction == "next" else True)
+        has_prev = bool(contents) and (more if direction == "prev" else bool(cursor))
+        return self.make_response(
+            payload=dump_contents(contents, only),
+            message="Contents retrieved successfully",
+            pagination=get_cursor_pagination_info(
+                content_cursor("next", contents[-1]) if has_next else None,
+                has_next,
+                per_page,
+                prev_cursor=content_cursor("prev", contents[0]) if has_prev else None,
+                total_items=count,
+            ),
+        )
+
     @jwt_required()
     @is_admin_or_editor
     def post(self):
@@ -44,35 +276,92 @@ class ContentListResource(BaseResource):
         data = request.get_json()
         content = Content(title=data["title"], body=data["body"])
         db.session.add(content)
-        db.session.commit()
+        store_chunks(content)
 
-        # Publish message to RabbitMQ
-        message = {
-            "op": "create",
-            "id": content.id,
-            "title": content.title,
-            "body": content.body,
-        }
-        PRODUCER.publish_message(json.dumps(message))
+        # Queue the message for RabbitMQ in the same transaction
+        add_outbox_event(content.id, create_event(content))
+        db.session.commit()
+        OUTBOX_RELAY.notify()
         return self.make_response(
-            payload=CONTENT_SCHEMA.dump(content),
+            payload=dump_content(content),
             message="Content created successfully",
             status=201,
         )
 
 
+def get_changes_limit():
+    """Read the change feed ``limit``, clamped to ``CHANGES_MAX_LIMIT``."""
+    limit = request.args.get("limit", CHANGES_DEFAULT_LIMIT, type=int)
+    return min(max(limit, 1), CHANGES_MAX_LIMIT)
+
+
+class ContentChangesResource(BaseResource):
+    """Resource to handle the content change feed."""
+
+    @jwt_required()
+    @limiter.limit(list_budget, cost=get_changes_limit)
+    def get(self):
+        """Method to get the contents changed since a cursor.
+
+        Changes are ordered by (updated_at, id) and include tombstones of
+        deleted contents. Changes younger than CHANGES_FEED_SETTLE_SECONDS are
+        held back, so that a transaction committing late cannot slip behind a
+        cursor that was already handed out.
+        """
+        limit = get_changes_limit()
+        query = Content.query
+        since = request.args.get("since")
+        since_updated_at = None
+        if since:
+            try:
+                since_updated_at, since_id = decode_cursor(since, datetime, str)
+            except ValueError:
+                return self.make_response(
+                    message="Unable to retrieve changes",
+                    error="Invalid cursor",
+                    status=400,
+                )
+            query = query.filter(
+                keyset_after(Content.updated_at, Content.id, since_updated_at, since_id)
+            )
+        settle = current_app.config["CHANGES_FEED_SETTLE_SECONDS"]
+        if settle > 0:
+            query = query.filter(
+                Content.updated_at <= datetime.now() - timedelta(seconds=settle)
+            )
+        contents = query.order_by(Content.updated_at, Content.id).limit(limit + 1).all()
+        has_more = len(contents) > limit
+        contents = contents[:limit]
+        next_cursor = (
+            encode_cursor(contents[-1].updated_at, contents[-1].id)
+            if contents
+            else since
+        )
+        return self.make_response(
+            payload=[change_to_dict(content, since_updated_at) for content in contents],
+            message="Changes retrieved successfully",
+            pagination=get_cursor_pagination_info(next_cursor, has_more, limit),
+        )
+
+
 class ContentResource(BaseResource):
     """Resource to handle a single content."""
 
+    @limiter.limit(read_budget)
     @jwt_required()
-    def get(self, content_id):
-        """Method to get a single content."""
-        content = Content.query.filter(
-            Content.deleted_at.is_(None), Content.id == content_id
-        ).first()
+    @with_entity(Content, "content_id", "content")
+    @conditional_get("content", "CONTENT_CACHE_CONTROL", content_validators)
+    def get(self, content):
+        """Method to get a single content, with the fields asked for."""
+        try:
+            only = read_fieldset()
+        except ValueError as error:
+            return self.make_response(
+                message="Unable to retrieve content", error=str(error), status=400
+            )
         if content:
             return self.make_response(
-                payload=CONTENT_SCHEMA.dump(content),
+                payload=dump_content(content, only),
                 message="Content retrieved successfully",
             )
         return self.make_response(
@@ -81,51 +370,48 @@ class ContentResource(BaseResource):
 
     @jwt_required()
     @is_admin_or_editor
-    def put(self, content_id):
+    @with_entity(Content, "content_id", "content")
+    def put(self, content):
         """Method to update a single content."""
-        content = Content.query.filter(
-            Content.deleted_at.is_(None), Content.id == content_id
-        ).first()
         if not content:
             return self.make_response(
                 message="Unable to edit content", error="Content not found", status=404
             )
         data = request.get_json()
+        previous_title, previous_body = content.title, content.body
         content.updated_at = datetime.now()
         content = CONTENT_SCHEMA.load(
             data, instance=content, partial=True, session=db.session
         )
-        db.session.commit()
+        if content.body != previous_body:
+            store_chunks(content)
 
-        # Publish message to RabbitMQ
-        message = {
-            "op": "update",
-            "id": content.id,
-            "title": content.title,
-            "body": content.body,
-        }
-        PRODUCER.publish_message(json.dumps(message))
+        # Queue the changed fields for RabbitMQ in the same transaction
+        add_outbox_event(
+            content.id, update_event(content, previous_title, previous_body)
+        )
+        db.session.commit()
+        OUTBOX_RELAY.notify()
         return self.make_response(
-            payload=CONTENT_SCHEMA.dump(content), message="Content updated successfully"
+            payload=dump_content(content), message="Content updated successfully"
         )
 
     @jwt_required()
     @is_admin_or_editor
-    def delete(self, content_id):
+    @with_entity(Content, "content_id", "content")
+    def delete(self, content):
         """Method to delete a single content."""
-        content = Content.query.filter(
-            Content.deleted_at.is_(None), Content.id == content_id
-        ).first()
         if not content:
             return self.make_response(
                 message="Unable to delete content",
                 error="Content not found",
                 status=404,
             )
-        content.deleted_at = datetime.now()
-        db.session.commit()
+        content.deleted_at = content.updated_at = datetime.now()
+        delete_chunks(content.id)
 
-        # Publish message to RabbitMQ
-        message = {"op": "delete", "id": content.id, "title": None, "content": None}
-        PRODUCER.publish_message(json.dumps(message))
+        # Queue the message for RabbitMQ in the same transaction
+        add_outbox_event(content.id, delete_event(content.id))
+        db.session.commit()
+        OUTBOX_RELAY.notify()
         return self.make_response(message="Content deleted successfully")
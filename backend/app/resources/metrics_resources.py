@@ -0,0 +1,18 @@
+"""Definition of the resource exposing operational metrics."""
+
+from flask_jwt_extended import jwt_required
+from ..middlewares.is_admin import is_admin
+from ..services.metrics import METRICS
+from .base_resource import BaseResource
+
+
+class MetricsResource(BaseResource):
+    """Resource to expose queue depths, latencies and failure counters."""
+
+    @jwt_required()
+    @is_admin
+    def get(self):
+        """Method to get the current value of every metric (Only accessible by admins)."""
+        return self.make_response(
+            payload=METRICS.snapshot(), message="Metrics retrieved successfully"
+        )
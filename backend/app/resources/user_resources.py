@@ -1,10 +1,17 @@
 """Definitions of user resources."""
 
 from datetime import datetime
-from flask import request
+from flask import current_app, request
 from flask_jwt_extended import jwt_required
 
-from app.utils.pagination import get_pagination_info
+from app.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    get_cursor_pagination_info,
+    get_pagination_info,
+    get_per_page,
+    keyset_after,
+)
 from app.utils.user_factory import create_user_instance
 from .base_resource import BaseResource
 from ..models.user import (
@@ -15,8 +22,15 @@ from ..models.user import (
     AdminUserSchema,
 )
 from ..extensions import DB as db
+from ..middlewares.conditional_get import conditional_get
+from ..middlewares.entities import with_entity
 from ..middlewares.is_admin import is_admin
 from ..middlewares.is_admin_or_self import is_admin_or_self
+from ..services.auth_cache import AUTH_CACHE
+from ..services.limiter import LIMITER as limiter, list_budget, read_budget
+from ..services.passwords import PasswordServiceBusy
+from ..services.user_provisioning import UserProvisioner, read_rows
+from ..services.tokens import TOKEN_REVOCATIONS
 
 USER_SCHEMA = UserSchema()
 USERS_SCHEMA = UserSchema(many=True)
@@ -26,17 +40,87 @@ USER_SCHEMAS = {
     "admin": AdminUserSchema(),
     "editor": EditorUserSchema(),
 }
+SEARCH_ARGS = ("q", "role", "status", "cursor")
+SEARCH_COLUMNS = {
+    "username": User.username,
+    "email": User.email,
+    "last_name": User.last_name,
+}
+
+
+def search_by_id(query, per_page):
+    """Return a page of users in id order and the cursor of the next one."""
+    cursor = request.args.get("cursor")
+    if cursor:
+        (after_id,) = decode_cursor(cursor, str)
+        query = query.filter(User.id > after_id)
+    users = query.order_by(User.id).limit(per_page + 1).all()
+    if len(users) <= per_page:
+        return users, None
+    return users[:per_page], encode_cursor(users[per_page - 1].id)
+
+
+def decode_search_cursor(cursor):
+    """Return the position of the cursor's column and its (value, id) bound."""
+    name, value, after_id = decode_cursor(cursor, str, str, str)
+    if name not in SEARCH_COLUMNS:
+        raise ValueError("Invalid cursor")
+    return list(SEARCH_COLUMNS).index(name), (value, after_id)
+
+
+def prefix_matches(query, q, position):
+    """Filter a query to the users whose first match is at ``position``."""
+    names = list(SEARCH_COLUMNS)
+    query = query.filter(SEARCH_COLUMNS[names[position]].startswith(q, autoescape=True))
+    for earlier in names[:position]:
+        query = query.filter(
+            db.not_(SEARCH_COLUMNS[earlier].startswith(q, autoescape=True))
+        )
+    return query
+
+
+def search_prefix(query, q, per_page):
+    """Return a page of users matching a prefix and the cursor of the next one.
+
+    The users matching on each of ``SEARCH_COLUMNS`` are listed in turn,
+    leaving out those an earlier column already matched, each with a range
+    of the column's index ordered by the column and id. The cursor holds
+    the column, its value and the id of the last user.
+    """
+    names = list(SEARCH_COLUMNS)
+    start, after = 0, None
+    cursor = request.args.get("cursor")
+    if cursor:
+        start, after = decode_search_cursor(cursor)
+    matches = []
+    for position in range(start, len(names)):
+        column = SEARCH_COLUMNS[names[position]]
+        page = prefix_matches(query, q, position)
+        if after is not None and position == start:
+            page = page.filter(keyset_after(column, User.id, *after))
+        users = page.order_by(column, User.id).limit(per_page + 1 - len(matches))
+        matches.extend((names[position], user) for user in users)
+        if len(matches) > per_page:
+            break
+    users = [user for _name, user in matches[:per_page]]
+    if len(matches) <= per_page:
+        return users, None
+    name, user = matches[per_page - 1]
+    return users, encode_cursor(name, getattr(user, name), user.id)
 
 
 class UserListResource(BaseResource):
     """Resource to handle listing users (admin only)."""
 
+    @limiter.limit(list_budget, cost=get_per_page)
     @jwt_required()
     @is_admin
     def get(self):
         """Get a list of all users (admin only)."""
+        if any(arg in request.args for arg in SEARCH_ARGS):
+            return self.search()
         page = request.args.get("page", 1, type=int)
-        per_page = request.args.get("per_page", 15, type=int)
+        per_page = get_per_page()
         pagination_object = User.query.filter(User.deleted_at.is_(None)).paginate(
             page=page, per_page=per_page
         )
@@ -48,6 +132,49 @@ class UserListResource(BaseResource):
             message="Users retrieved successfully",
         )
 
+    def search(self):
+        """Search users by prefix and filters, paging through them by keyset.
+
+        ``q`` matches the start of the username, email or last name; ``role``
+        and ``status`` filter exactly. Pages follow the ``cursor`` of the
+        previous page, so each one is an index range rather than an offset:
+        without ``q`` users are listed by id, and with it the matches of each
+        column are listed in turn, in the order of that column's index.
+        """
+        per_page = get_per_page()
+        query = User.query.filter(User.deleted_at.is_(None))
+        role = request.args.get("role")
+        if role:
+            if role.lower() not in USER_SCHEMAS:
+                return self.make_response(
+                    message="Unable to search users", error="Invalid role", status=400
+                )
+            query = query.filter(User.role == role.lower())
+        status = request.args.get("status")
+        if status:
+            if status.lower() not in ("true", "false"):
+                return self.make_response(
+                    message="Unable to search users", error="Invalid status", status=400
+                )
+            query = query.filter(User.status.is_(status.lower() == "true"))
+        q = request.args.get("q", "").strip()
+        try:
+            if q:
+                users, next_cursor = search_prefix(query, q, per_page)
+            else:
+                users, next_cursor = search_by_id(query, per_page)
+        except ValueError:
+            return self.make_response(
+                message="Unable to search users", error="Invalid cursor", status=400
+            )
+        return self.make_response(
+            payload=USERS_SCHEMA.dump(users),
+            pagination=get_cursor_pagination_info(
+                next_cursor, next_cursor is not None, per_page
+            ),
+            message="Users retrieved successfully",
+        )
+
     @jwt_required()
     @is_admin
     def post(self):
@@ -57,7 +184,12 @@ class UserListResource(BaseResource):
             return self.make_response(
                 message="Unable to create user", error="User already exists", status=400
             )
-        new_user = create_user_instance(data)
+        try:
+            new_user = create_user_instance(data)
+        except PasswordServiceBusy as e:
+            return self.make_response(
+                message="Unable to create user", error=str(e), status=503
+            )
         db.session.add(new_user)
         db.session.commit()
         user_schema = USER_SCHEMAS.get(new_user.role, RegularUserSchema())
@@ -68,14 +200,36 @@ class UserListResource(BaseResource):
         )
 
 
+class UserBulkResource(BaseResource):
+    """Resource to provision many users at once (admin only)."""
+
+    @jwt_required()
+    @is_admin
+    def post(self):
+        """Create the users of a CSV or NDJSON upload (admin only)."""
+        provisioner = UserProvisioner(current_app.config["BULK_USERS_BATCH_SIZE"])
+        try:
+            provisioner.run(read_rows(request.stream, request.mimetype))
+        except ValueError as e:
+            return self.make_response(
+                message="Unable to create users", error=str(e), status=415
+            )
+        return self.make_response(
+            payload={**provisioner.summary(), "results": provisioner.results},
+            message="Users provisioned",
+        )
+
+
 class UserResource(BaseResource):
     """Resource to handle user operations (admin only)."""
 
+    @limiter.limit(read_budget)
     @jwt_required()
     @is_admin_or_self
-    def get(self, user_id):
+    @with_entity(User, "user_id", "user")
+    @conditional_get("user", "USER_CACHE_CONTROL")
+    def get(self, user):
         """Get a user by ID (admin and the user only)."""
-        user = User.query.filter(User.deleted_at.is_(None), User.id == user_id).first()
         if not user:
             return self.make_response(
                 message="Unable to retrieve user", error="User not found", status=404
@@ -87,11 +241,9 @@ class UserResource(BaseResource):
 
     @jwt_required()
     @is_admin_or_self
-    def delete(self, user_id):
+    @with_entity(User, "user_id", "user_to_delete")
+    def delete(self, user_to_delete):
         """Delete a user by ID (admin only)."""
-        user_to_delete = User.query.filter(
-            User.deleted_at.is_(None), User.id == user_id
-        ).first()
         if not user_to_delete:
             return self.make_response(
                 message="Unable to delete user", error="User not found", status=404
@@ -103,6 +255,8 @@ class UserResource(BaseResource):
                 status=400,
             )
         user_to_delete.deleted_at = datetime.now()
+        TOKEN_REVOCATIONS.revoke(user_to_delete)
+        AUTH_CACHE.invalidate(user_to_delete.id)
         db.session.commit()
         return self.make_response(
             message="User deleted successfully",
@@ -110,11 +264,9 @@ class UserResource(BaseResource):
 
     @jwt_required()
     @is_admin
-    def put(self, user_id):
+    @with_entity(User, "user_id", "user_to_modify")
+    def put(self, user_to_modify):
         """Promote a user to admin (admin only)."""
-        user_to_modify = User.query.filter(
-            User.deleted_at.is_(None), User.id == user_id
-        ).first()
         if not user_to_modify:
             return self.make_response(
                 message="Unable to update user role", error="User not found", status=404
@@ -129,6 +281,8 @@ class UserResource(BaseResource):
         if "role" in data and data["role"].lower() in ["admin", "editor", "regular"]:
             user_to_modify.updated_at = datetime.now()
             user_to_modify.role = data["role"].lower()
+            TOKEN_REVOCATIONS.revoke(user_to_modify)
+            AUTH_CACHE.invalidate(user_to_modify.id)
             db.session.commit()
             return self.make_response(
                 payload=USER_SCHEMA.dump(user_to_modify),
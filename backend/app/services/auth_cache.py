@@ -0,0 +1,213 @@
+"""Process-wide cache of the authorization record of users."""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import event, select
+
+from app.extensions import DB as db
+from app.models.auth_invalidation import AuthInvalidation
+from app.models.user import User
+from app.services.metrics import METRICS
+
+AuthRecord = namedtuple("AuthRecord", ["id", "role", "active"])
+
+
+class LocalInvalidations:
+    """Invalidation backend for a single process: nothing to share."""
+
+    def publish(self, user_id):
+        """Announce that a user changed."""
+
+    def poll(self):
+        """Return the users other processes invalidated since the last poll."""
+        return []
+
+
+class DatabaseInvalidations:
+    """Invalidation backend sharing invalidations through the database.
+
+    ``publish`` stages a row in the session of the change, so it commits
+    with it; ``poll`` reads the rows created since the previous poll, at
+    most once every ``interval`` seconds. It goes back ``overlap`` further
+    to catch rows committed after rows created later, and remembers the
+    rows of that window so each is returned once. Rows older than
+    ``retention`` are pruned since no cached entry can be older than that.
+    """
+
+    def __init__(self, interval, retention, overlap):
+        """Initialize the backend."""
+        self.interval = interval
+        self.retention = retention
+        self.overlap = overlap
+        self._polled_since = None
+        self._seen = {}
+        self._polled_at = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self, user_id):
+        """Stage an invalidation in the current session."""
+        AuthInvalidation.query.filter(
+            AuthInvalidation.created_at < datetime.now() - self.retention
+        ).delete(synchronize_session=False)
+        db.session.add(AuthInvalidation(user_id))
+
+    def poll(self):
+        """Return the users invalidated since the last poll."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._polled_at < self.interval:
+                return []
+            self._polled_at = now
+            polled_since = self._polled_since
+        started = datetime.now()
+        if polled_since is None:
+            # Cached entries are all newer than the committed invalidations.
+            self._polled_since = started
+            return []
+        since = polled_since - self.overlap
+        rows = db.session.execute(
+            select(
+                AuthInvalidation.id,
+                AuthInvalidation.user_id,
+                AuthInvalidation.created_at,
+            ).where(AuthInvalidation.created_at >= since)
+        ).all()
+        with self._lock:
+            fresh = [row for row in rows if row.id not in self._seen]
+            self._seen.update((row.id, row.created_at) for row in fresh)
+            for row_id, created_at in list(self._seen.items()):
+                if created_at < started - self.overlap:
+                    del self._seen[row_id]
+            self._polled_since = started
+        return [row.user_id for row in fresh]
+
+
+BACKENDS = ("memory", "database")
+
+
+# pylint: disable=too-many-instance-attributes
+class AuthCache:
+    """Size-bounded LRU cache of authorization records expiring after a TTL.
+
+    Entries are evicted right away when a user's role or status changes in
+    this process; other processes learn about it from the invalidation
+    backend chosen with ``AUTH_CACHE_BACKEND``, or at worst once the entry
+    expires after ``AUTH_CACHE_TTL`` seconds.
+    """
+
+    def __init__(self, metrics=METRICS):
+        """Initialize an empty cache; ``init_app`` applies the settings."""
+        self.metrics = metrics
+        self.maxsize = 10000
+        self.ttl = 30.0
+        self.invalidations = LocalInvalidations()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._hits = self._misses = 0
+        metrics.register_gauge("auth_cache.size", lambda: len(self._entries))
+        metrics.register_gauge("auth_cache.hit_rate", self.hit_rate)
+
+    def init_app(self, app):
+        """Configure the cache from the application settings."""
+        self.maxsize = app.config["AUTH_CACHE_SIZE"]
+        self.ttl = app.config["AUTH_CACHE_TTL"]
+        backend = app.config["AUTH_CACHE_BACKEND"]
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown auth cache backend: {backend}")
+        if backend == "database":
+            self.invalidations = DatabaseInvalidations(
+                app.config["AUTH_CACHE_SYNC_INTERVAL"],
+                timedelta(seconds=self.ttl),
+                timedelta(seconds=app.config["AUTH_CACHE_SYNC_OVERLAP"]),
+            )
+        else:
+            self.invalidations = LocalInvalidations()
+        if not event.contains(db.session, "after_commit", self._after_commit):
+            event.listen(db.session, "after_commit", self._after_commit)
+        self.clear()
+
+    def get(self, user_id):
+        """Return the authorization record of a user, loading it on a miss."""
+        for invalidated in self.invalidations.poll():
+            self._evict(invalidated)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                self.metrics.increment("auth_cache.hits")
+                return entry[0]
+            self._misses += 1
+            generation = self._generation
+        self.metrics.increment("auth_cache.misses")
+        record = self._load(user_id)
+        if record is not None:
+            self._store(user_id, record, now + self.ttl, generation)
+        return record
+
+    def invalidate(self, user_id):
+        """Forget a user here and, through the backend, in other processes.
+
+        Call it before committing the change: the entry is evicted again
+        once the transaction commits, in case a concurrent request cached
+        the record as it was before.
+        """
+        self.invalidations.publish(user_id)
+        db.session.info.setdefault("auth_cache_invalidated", set()).add(user_id)
+        self._evict(user_id)
+        self.metrics.increment("auth_cache.invalidations")
+
+    def clear(self):
+        """Forget every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def hit_rate(self):
+        """Return the share of lookups served from the cache."""
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+    def _after_commit(self, session):
+        """Evict the users invalidated in a committed transaction."""
+        for user_id in session.info.pop("auth_cache_invalidated", ()):
+            self._evict(user_id)
+
+    def _load(self, user_id):
+        """Read the authorization record of a user from the database."""
+        row = db.session.execute(
+            select(User.id, User.role, User.deleted_at).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        return AuthRecord(row.id, row.role, row.deleted_at is None)
+
+    def _store(self, user_id, record, expires_at, generation):
+        """Add an entry, evicting the least recently used ones when full.
+
+        Nothing is stored if an invalidation happened since ``generation``,
+        as the record may have been read before the change.
+        """
+        evicted = 0
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[user_id] = (record, expires_at)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.metrics.increment("auth_cache.evictions", evicted)
+
+    def _evict(self, user_id):
+        """Drop the entry of a user."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+
+AUTH_CACHE = AuthCache()
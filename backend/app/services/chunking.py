@@ -0,0 +1,141 @@
+"""Split content bodies into stable passages identified by their hash.
+
+Passages are paragraphs; a paragraph longer than ``MAX_CHUNK_CHARS`` is
+split between sentences, and a sentence longer than that is cut. Editing a
+paragraph therefore changes a single passage and leaves the hashes of the
+others untouched.
+"""
+
+import re
+from collections import namedtuple
+from hashlib import blake2b
+
+from app.extensions import DB as db
+from app.models.content_chunk import ContentChunk
+
+MAX_CHUNK_CHARS = 1000
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+Passage = namedtuple("Passage", ["position", "hash", "start", "end"])
+
+
+def chunk_hash(text):
+    """Return the hash identifying a passage text."""
+    return blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _spans(text, separator, start, end):
+    """Yield the stripped, non-empty spans of ``text[start:end]`` between separators."""
+    position = start
+    breaks = [
+        (match.start(), match.end()) for match in separator.finditer(text, start, end)
+    ]
+    for span_end, next_start in breaks + [(end, end)]:
+        span_start = position
+        while span_start < span_end and text[span_start].isspace():
+            span_start += 1
+        while span_end > span_start and text[span_end - 1].isspace():
+            span_end -= 1
+        if span_start < span_end:
+            yield span_start, span_end
+        position = next_start
+
+
+def _passage_spans(body):
+    """Yield the start and end of every passage of a body."""
+    for start, end in _spans(body, PARAGRAPH_BREAK, 0, len(body)):
+        if end - start <= MAX_CHUNK_CHARS:
+            yield start, end
+            continue
+        # Pack whole sentences into passages of at most MAX_CHUNK_CHARS.
+        passage_start = passage_end = None
+        for sentence_start, sentence_end in _spans(body, SENTENCE_BREAK, start, end):
+            if (
+                passage_start is not None
+                and sentence_end - passage_start <= MAX_CHUNK_CHARS
+            ):
+                passage_end = sentence_end
+                continue
+            if passage_start is not None:
+                yield passage_start, passage_end
+            while sentence_end - sentence_start > MAX_CHUNK_CHARS:
+                yield sentence_start, sentence_start + MAX_CHUNK_CHARS
+                sentence_start += MAX_CHUNK_CHARS
+            passage_start, passage_end = sentence_start, sentence_end
+        if passage_start is not None:
+            yield passage_start, passage_end
+
+
+def chunk_body(body):
+    """Return the passages of a body in order."""
+    return [
+        Passage(position, chunk_hash(body[start:end]), start, end)
+        for position, (start, end) in enumerate(_passage_spans(body))
+    ]
+
+
+def diff_chunks(previous_body, body):
+    """Return the passages added, changed, moved and removed by an edit.
+
+    Passages are matched by hash first, so an unchanged passage that only
+    moved is not sent again; an unmatched passage taking the position of an
+    unmatched previous one is reported as changed. Offsets refer to ``body``.
+    """
+    previous = chunk_body(previous_body) if previous_body else []
+    unmatched = {}
+    for passage in previous:
+        unmatched.setdefault(passage.hash, []).append(passage)
+    diff = {"added": [], "changed": [], "moved": [], "removed": []}
+    new_passages = []
+    for passage in chunk_body(body):
+        same = unmatched.get(passage.hash)
+        if same:
+            old = same.pop(0)
+            if old.position != passage.position:
+                diff["moved"].append(
+                    {"position": passage.position, "hash": passage.hash}
+                )
+            continue
+        new_passages.append(passage)
+    left = {p.position: p for group in unmatched.values() for p in group}
+    for passage in new_passages:
+        entry = {
+            "position": passage.position,
+            "hash": passage.hash,
+            "start": passage.start,
+            "end": passage.end,
+        }
+        old = left.pop(passage.position, None)
+        if old is None:
+            diff["added"].append(entry)
+        else:
+            diff["changed"].append({**entry, "previous": old.hash})
+    diff["removed"] = [
+        {"position": old.position, "hash": old.hash}
+        for old in sorted(left.values(), key=lambda old: old.position)
+    ]
+    return {name: entries for name, entries in diff.items() if entries}
+
+
+def store_chunks(content):
+    """Replace the stored passages of a content with those of its body."""
+    ContentChunk.query.filter_by(content_id=content.id).delete(
+        synchronize_session=False
+    )
+    db.session.add_all(
+        ContentChunk(
+            content.id,
+            passage.position,
+            passage.hash,
+            content.body[passage.start : passage.end],
+        )
+        for passage in chunk_body(content.body or "")
+    )
+
+
+def delete_chunks(content_id):
+    """Delete the stored passages of a content."""
+    ContentChunk.query.filter_by(content_id=content_id).delete(
+        synchronize_session=False
+    )
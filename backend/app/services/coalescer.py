@@ -0,0 +1,71 @@
+"""Coalescing of redundant content events before they are published."""
+
+import json
+
+from app.services.content_events import dump_event, is_staged, merge_update
+
+
+def _parse(message):
+    """Return the decoded staged event, or None when it cannot be coalesced."""
+    try:
+        event = json.loads(message)
+    except ValueError:
+        return None
+    if (
+        not isinstance(event, dict)
+        or event.get("id") is None
+        or event.get("op") not in ("create", "update", "delete")
+        or not is_staged(event)
+    ):
+        return None
+    return event
+
+
+def _merge(previous, event):
+    """Merge two consecutive events of one content.
+
+    Returns the event replacing both, None when they cancel out and False
+    when both must be published: an update folds into the event it follows,
+    and a delete cancels a create that was never published.
+    """
+    if event["op"] == "update" and previous["op"] in ("create", "update"):
+        return merge_update(previous, event)
+    if event["op"] == "delete" and previous["op"] == "create":
+        return None
+    if event["op"] == "delete" and previous["op"] == "update":
+        return event
+    return False
+
+
+def coalesce(messages):
+    """Collapse the events of each content id; return the messages and the saving.
+
+    Events of one id keep their relative order and a merged event takes the
+    position of the newest event it replaces. Messages that are not content
+    events are passed through untouched.
+    """
+    slots = []
+    latest = {}
+    for message in messages:
+        event = _parse(message)
+        if event is None:
+            slots.append(message)
+            continue
+        index = latest.get(event["id"])
+        merged = _merge(slots[index][1], event) if index is not None else False
+        if merged is False:
+            latest[event["id"]] = len(slots)
+            slots.append((message, event))
+            continue
+        slots[index] = None
+        if merged is None:
+            del latest[event["id"]]
+            continue
+        latest[event["id"]] = len(slots)
+        slots.append((dump_event(merged), merged))
+    coalesced = [
+        slot[0] if isinstance(slot, tuple) else slot
+        for slot in slots
+        if slot is not None
+    ]
+    return coalesced, len(messages) - len(coalesced)
@@ -1,16 +1,92 @@
 """Helper functions for comments."""
 
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from collections import defaultdict
 from flask import abort
-from app.models.comment import Comment
+from app.extensions import DB as db
+from app.middlewares.authorization import get_current_user
+from app.middlewares.entities import load_entity
+from app.models.comment import Comment, CommentSchema
+from app.utils.pagination import encode_cursor, keyset_after
+
+COMMENT_ORDERS = ("oldest", "newest")
+CONTENT_COMMENTS_SCHEMA = CommentSchema(many=True, exclude=("content",))
 
 
 def get_comment_and_user(**kwargs):
     """Service to retrieve the current user and comment."""
-    verify_jwt_in_request()
-    current_user_id = get_jwt_identity()
+    current_user = get_current_user()
     comment_id = kwargs.get("comment_id")
-    comment = Comment.query.filter_by(id=comment_id, deleted_at=None).first()
+    comment = load_entity(Comment, comment_id)
     if not comment:
         abort(404, description="Comment not found.")
-    return current_user_id, comment
+    return current_user, comment
+
+
+def page_comments(content_id, order, limit, after=None):
+    """Service to read a page of the live comments of a content.
+
+    Comments are ordered by (created_at, id), ``oldest`` or ``newest`` first,
+    and ``after`` is the (created_at, id) of the last comment of the
+    previous page. Returns the comments and the cursor of the next page,
+    None on the last page.
+    """
+    query = Comment.query.filter(
+        Comment.content_id == content_id, Comment.deleted_at.is_(None)
+    )
+    newest = order == "newest"
+    if after:
+        query = query.filter(
+            keyset_after(Comment.created_at, Comment.id, *after, descending=newest)
+        )
+    if newest:
+        query = query.order_by(Comment.created_at.desc(), Comment.id.desc())
+    else:
+        query = query.order_by(Comment.created_at, Comment.id)
+    comments = query.limit(limit + 1).all()
+    if len(comments) <= limit:
+        return comments, None
+    comments = comments[:limit]
+    return comments, encode_cursor(order, comments[-1].created_at, comments[-1].id)
+
+
+def first_comments(content_ids, limit):
+    """Service to read the first page of live comments of several contents.
+
+    Reads at most ``limit`` + 1 comments of each content, oldest first, in
+    one query. Returns, for each content id, the comments and the cursor of
+    the next page as ``page_comments`` does.
+    """
+    ranked = (
+        db.select(
+            Comment.id,
+            db.func.row_number()
+            .over(
+                partition_by=Comment.content_id,
+                order_by=(Comment.created_at, Comment.id),
+            )
+            .label("rank"),
+        )
+        .where(Comment.content_id.in_(content_ids), Comment.deleted_at.is_(None))
+        .subquery()
+    )
+    comments = (
+        Comment.query.join(ranked, ranked.c.id == Comment.id)
+        .filter(ranked.c.rank <= limit + 1)
+        .order_by(Comment.created_at, Comment.id)
+        .all()
+    )
+    grouped = defaultdict(list)
+    for comment in comments:
+        grouped[comment.content_id].append(comment)
+    pages = {}
+    for content_id in content_ids:
+        comments = grouped[content_id]
+        if len(comments) <= limit:
+            pages[content_id] = (comments, None)
+            continue
+        comments = comments[:limit]
+        pages[content_id] = (
+            comments,
+            encode_cursor("oldest", comments[-1].created_at, comments[-1].id),
+        )
+    return pages
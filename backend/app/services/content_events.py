@@ -0,0 +1,157 @@
+"""Versioned envelope of the content events published to the message queue.
+
+Version 1 events are compact JSON objects with ``v``, ``op`` and ``id``:
+
+- ``create`` carries the ``title`` and ``body`` of the new content.
+- ``update`` carries only the fields that changed. A changed body is sent
+  either in full or, when smaller, as a ``body_delta`` of
+  ``[start, deleted, inserted]`` to apply to the previous body, whose CRC32
+  is sent as ``base`` so consumers can check they hold that revision.
+- ``delete`` carries nothing else.
+
+Events with a body also list the passages it is split into that were
+``added``, ``changed``, ``moved`` or ``removed`` under ``chunks``, with
+their hash and the offsets of their text in the new body (see
+``app.services.chunking``), so consumers only embed the passages that
+changed.
+
+The outbox stores events as staged by ``create_event`` and
+``update_event``: updates keep the full new body with the body of the
+revision they replace under ``previous_body``, so that consecutive saves
+coalesce into one update from the last published revision. The relay turns
+them into the published form with ``publishable_message``, which computes
+the ``body_delta``, ``base`` and ``chunks``.
+
+Large payloads are compressed by the producer; ``decode_payload`` turns a
+received message back into an event.
+"""
+
+import json
+import zlib
+
+from app.services.chunking import diff_chunks
+
+ENVELOPE_VERSION = 1
+CONTENT_TYPE = "application/json"
+COMPRESSED_ENCODING = "deflate"
+
+
+def dump_event(event):
+    """Serialize an event without insignificant whitespace."""
+    return json.dumps(event, separators=(",", ":"), ensure_ascii=False)
+
+
+def _checksum(text):
+    """Return the CRC32 of a text as hex, identifying a body revision."""
+    return f"{zlib.crc32(text.encode('utf-8')):08x}"
+
+
+def create_event(content):
+    """Return the staged event announcing a new content."""
+    return dump_event(
+        {
+            "v": ENVELOPE_VERSION,
+            "op": "create",
+            "id": content.id,
+            "title": content.title,
+            "body": content.body,
+        }
+    )
+
+
+def update_event(content, previous_title, previous_body):
+    """Return the staged event with the fields changed since the previous revision."""
+    event = {"v": ENVELOPE_VERSION, "op": "update", "id": content.id}
+    if content.title != previous_title:
+        event["title"] = content.title
+    if content.body != previous_body:
+        event["body"] = content.body
+        event["previous_body"] = previous_body
+    return dump_event(event)
+
+
+def delete_event(content_id):
+    """Return the serialized event announcing a deleted content."""
+    return dump_event({"v": ENVELOPE_VERSION, "op": "delete", "id": content_id})
+
+
+def body_delta(previous, current):
+    """Return the single splice ``[start, deleted, inserted]`` turning one body into another."""
+    start = 0
+    limit = min(len(previous), len(current))
+    while start < limit and previous[start] == current[start]:
+        start += 1
+    # The common suffix must not overlap the common prefix.
+    end = 0
+    while end < limit - start and previous[-end - 1] == current[-end - 1]:
+        end += 1
+    return [start, len(previous) - start - end, current[start : len(current) - end]]
+
+
+def apply_body_delta(previous, delta):
+    """Return the body obtained by applying ``delta`` to ``previous``."""
+    start, deleted, inserted = delta
+    return previous[:start] + inserted + previous[start + deleted :]
+
+
+def merge_update(previous, event):
+    """Fold a staged update into the earlier create or update of the same content.
+
+    The merged update keeps the ``previous_body`` of the first one that
+    changed the body, which is the body consumers hold.
+    """
+    merged = {**previous, **event, "op": previous["op"]}
+    if previous["op"] == "create":
+        merged.pop("previous_body", None)
+    elif "previous_body" in previous:
+        merged["previous_body"] = previous["previous_body"]
+    return merged
+
+
+def is_staged(event):
+    """Return whether an event is in the staged form kept by the outbox."""
+    return "chunks" not in event and "body_delta" not in event
+
+
+def render_event(event):
+    """Return the published form of a staged event."""
+    event = dict(event)
+    if event["op"] == "create":
+        event["chunks"] = diff_chunks(None, event["body"])
+    elif "previous_body" in event:
+        previous_body = event.pop("previous_body")
+        body = event.pop("body")
+        if body != previous_body:
+            delta = body_delta(previous_body, body)
+            if len(dump_event(delta)) < len(dump_event(body)):
+                event["body_delta"] = delta
+                event["base"] = _checksum(previous_body)
+            else:
+                event["body"] = body
+            event["chunks"] = diff_chunks(previous_body, body)
+    return event
+
+
+def publishable_message(message):
+    """Return the message to publish for a message read from the outbox.
+
+    Messages that are not staged content events are returned untouched.
+    """
+    try:
+        event = json.loads(message)
+    except ValueError:
+        return message
+    if not isinstance(event, dict) or event.get("op") not in ("create", "update"):
+        return message
+    if not is_staged(event):
+        return message
+    return dump_event(render_event(event))
+
+
+def decode_payload(body, content_encoding=None):
+    """Return the event of a received message body."""
+    if content_encoding == COMPRESSED_ENCODING:
+        body = zlib.decompress(body)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    return json.loads(body)
@@ -1,6 +1,20 @@
 """Rate limiting service for Flask app."""
 
+from flask import current_app
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+# Registers the mmap:// storage scheme.
+from app.services import rate_limit_storage  # pylint: disable=unused-import
+
 LIMITER = Limiter(key_func=get_remote_address)
+
+
+def list_budget():
+    """Rate limit of list routes, counted in rows (see ``RATELIMIT_LIST_BUDGET``)."""
+    return current_app.config["RATELIMIT_LIST_BUDGET"]
+
+
+def read_budget():
+    """Rate limit of single-item reads (see ``RATELIMIT_READ_BUDGET``)."""
+    return current_app.config["RATELIMIT_READ_BUDGET"]
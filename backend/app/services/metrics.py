@@ -0,0 +1,49 @@
+"""In-process counters, gauges and timers for operational metrics."""
+
+import threading
+
+
+class Metrics:
+    """Thread-safe registry of named counters, gauges and timers."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._gauges = {}
+
+    def increment(self, name, value=1):
+        """Add ``value`` to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """Record one duration for a timer."""
+        with self._lock:
+            count, total, highest = self._timers.get(name, (0, 0.0, 0.0))
+            self._timers[name] = (count + 1, total + seconds, max(highest, seconds))
+
+    def register_gauge(self, name, read):
+        """Register a callable returning the current value of a gauge."""
+        with self._lock:
+            self._gauges[name] = read
+
+    def snapshot(self):
+        """Return the current value of every metric."""
+        with self._lock:
+            counters = dict(self._counters)
+            timers = dict(self._timers)
+            gauges = dict(self._gauges)
+        result = {name: read() for name, read in gauges.items()}
+        result.update(counters)
+        for name, (count, total, highest) in timers.items():
+            result[name] = {
+                "count": count,
+                "avg_seconds": total / count,
+                "max_seconds": highest,
+            }
+        return result
+
+
+METRICS = Metrics()
@@ -0,0 +1,222 @@
+"""Transactional outbox relay for content change events."""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pika.exceptions import AMQPError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import DB as db
+from app.models.outbox import OutboxEvent
+from app.services.coalescer import coalesce
+from app.services.content_events import publishable_message
+from app.services.metrics import METRICS
+from app.services.producer import PRODUCER
+
+LOGGER = logging.getLogger(__name__)
+RELAY_LOCK_NAME = "cms_outbox_relay"
+
+
+# pylint: disable=too-many-instance-attributes
+class OutboxRelay:
+    """Drain unpublished outbox events to the message queue.
+
+    Events are published in id order and marked as published only once the
+    broker has confirmed the whole batch, which gives at-least-once delivery.
+    Batches stay ordered only while a single relay drains the outbox: on
+    MySQL, relays elect one of them with a named lock held on a dedicated
+    connection, and the others publish nothing until it goes away. On other
+    databases, run a single relay. A batch is coalesced, when enabled, while
+    its events are still staged, and then rendered with the body deltas and
+    passage diffs against the revision consumers last received.
+    """
+
+    def __init__(self, producer):
+        """Initialize the relay with the producer used to publish batches."""
+        self.producer = producer
+        self.app = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._lock_connection = None
+        self._deadline = 0
+
+    def init_app(self, app):
+        """Bind the relay to an application and start it with its first request."""
+        self.app = app
+        app.before_request(self.ensure_running)
+        METRICS.register_gauge("outbox.pending", count_pending_outbox_events)
+
+    def ensure_running(self):
+        """Start the background thread in this process if enabled."""
+        if not self.app.config["OUTBOX_RELAY_ENABLED"] or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self.run, name="outbox-relay", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def notify(self):
+        """Wake the relay up after new events were committed."""
+        self.ensure_running()
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Stop the relay, publishing pending events for up to ``timeout`` seconds.
+
+        ``timeout`` defaults to ``OUTBOX_DRAIN_TIMEOUT``; events left after it
+        stay in the outbox for the next relay.
+        """
+        if timeout is None:
+            timeout = self.app.config["OUTBOX_DRAIN_TIMEOUT"] if self.app else 0
+        self._deadline = time.monotonic() + timeout
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self._pid = None
+        self._release_leadership()
+
+    def run(self):
+        """Drain the outbox until stopped, sleeping while it is empty."""
+        interval = self.app.config["OUTBOX_POLL_INTERVAL"]
+        window = self.app.config["OUTBOX_COALESCE_WINDOW"]
+        while True:
+            stopping = self._stopping.is_set()
+            self._wake.clear()
+            if window > 0 and not stopping:
+                # Let further edits join the batch so they can be coalesced.
+                self._stopping.wait(window)
+            try:
+                self.drain()
+            except (AMQPError, OSError):
+                LOGGER.exception("Outbox relay could not reach the broker")
+            except SQLAlchemyError:
+                LOGGER.exception("Outbox relay could not read the outbox")
+            if stopping:
+                return
+            self._wake.wait(interval)
+
+    def drain(self):
+        """Publish batches until the outbox is empty; return the event count."""
+        published = 0
+        while self._may_publish():
+            count = self.drain_once()
+            published += count
+            if count < self.app.config["OUTBOX_BATCH_SIZE"]:
+                break
+        return published
+
+    def _may_publish(self):
+        """Whether to go on publishing: until stopped, then until the drain deadline."""
+        return not self._stopping.is_set() or time.monotonic() < self._deadline
+
+    def drain_once(self):
+        """Publish and mark the oldest batch of pending events."""
+        with self.app.app_context():
+            if not self.is_leader():
+                return 0
+            try:
+                events = (
+                    OutboxEvent.query.filter(OutboxEvent.published_at.is_(None))
+                    .order_by(OutboxEvent.id)
+                    .limit(self.app.config["OUTBOX_BATCH_SIZE"])
+                    .all()
+                )
+                if not events:
+                    db.session.rollback()
+                    return 0
+                self.producer.publish_batch(
+                    self._publishable([event.payload for event in events])
+                )
+                published_at = datetime.now()
+                for event in events:
+                    event.published_at = published_at
+                db.session.commit()
+                METRICS.increment("outbox.published", len(events))
+                return len(events)
+            except Exception:
+                db.session.rollback()
+                METRICS.increment("outbox.failures")
+                raise
+
+    def _publishable(self, messages):
+        """Coalesce a batch when enabled and return the messages to publish."""
+        if self.app.config["OUTBOX_COALESCE_WINDOW"] > 0:
+            messages, saved = coalesce(messages)
+            if saved:
+                METRICS.increment("outbox.coalesced", saved)
+        return [publishable_message(message) for message in messages]
+
+    def is_leader(self):
+        """Return whether this relay may drain the outbox, taking the lock if free."""
+        if db.engine.dialect.name != "mysql":
+            return True
+        if self._lock_connection is not None:
+            try:
+                if self._lock_connection.execute(
+                    text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"),
+                    {"name": RELAY_LOCK_NAME},
+                ).scalar():
+                    return True
+            except SQLAlchemyError:
+                LOGGER.warning("Outbox relay lost its lock connection")
+            self._release_leadership()
+        connection = db.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if connection.execute(
+            text("SELECT GET_LOCK(:name, 0)"), {"name": RELAY_LOCK_NAME}
+        ).scalar():
+            self._lock_connection = connection
+            return True
+        connection.close()
+        return False
+
+    def _release_leadership(self):
+        """Drop the relay lock; the connection is discarded to make sure of it."""
+        connection, self._lock_connection = self._lock_connection, None
+        if connection is not None:
+            connection.invalidate()
+            connection.close()
+
+
+def count_pending_outbox_events():
+    """Return the number of events waiting to be published."""
+    return OutboxEvent.query.filter(OutboxEvent.published_at.is_(None)).count()
+
+
+def add_outbox_event(aggregate_id, payload):
+    """Stage an event in the current session, to be committed with the change."""
+    db.session.add(OutboxEvent(aggregate_id, payload))
+
+
+def replay_outbox_events(since):
+    """Mark events created since ``since`` as unpublished; return their count."""
+    count = OutboxEvent.query.filter(
+        OutboxEvent.created_at >= since, OutboxEvent.published_at.isnot(None)
+    ).update({OutboxEvent.published_at: None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def prune_outbox_events(before):
+    """Delete events published before ``before``; return their count."""
+    count = OutboxEvent.query.filter(OutboxEvent.published_at < before).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+
+OUTBOX_RELAY = OutboxRelay(PRODUCER)
+atexit.register(OUTBOX_RELAY.stop)
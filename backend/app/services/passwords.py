@@ -0,0 +1,147 @@
+"""Password hashing and verification off the request threads.
+
+bcrypt is slow on purpose, so hashing and checking passwords run in a
+dedicated process pool of ``PASSWORD_WORKERS`` processes. At most that many
+operations run at once; a request waiting longer than
+``PASSWORD_QUEUE_TIMEOUT`` seconds for a slot gets ``PasswordServiceBusy``,
+which resources turn into a ``503``, instead of stalling its worker.
+
+The pool processes are started with ``forkserver`` (``spawn`` where it is
+not available) rather than forked from a threaded web worker, which could
+copy locks held by other threads and connections of the application.
+"""
+
+import base64
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from bcrypt import checkpw, gensalt, hashpw
+
+from app.services.metrics import METRICS
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when no password worker frees up within the queue timeout."""
+
+
+def _hash(password, rounds):
+    """Hash a password with the given bcrypt cost, in a pool process."""
+    return hashpw(password, gensalt(rounds))
+
+
+def _hash_all(passwords, rounds):
+    """Hash several passwords with the given bcrypt cost, in a pool process."""
+    return [hashpw(password, gensalt(rounds)) for password in passwords]
+
+
+def _check(password, hashed):
+    """Check a password against a bcrypt hash, in a pool process."""
+    return checkpw(password, hashed)
+
+
+def _pool_context():
+    """Return the multiprocessing context starting the pool processes."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def hash_rounds(password_hash):
+    """Return the bcrypt cost of a stored password hash."""
+    hashed = base64.b64decode(password_hash.encode("utf-8"))
+    return int(hashed.split(b"$")[2])
+
+
+class PasswordHasher:
+    """Bounded process pool hashing and verifying bcrypt passwords."""
+
+    def __init__(self, metrics=METRICS):
+        """Initialize the hasher; ``init_app`` applies the settings."""
+        self.metrics = metrics
+        self.rounds = 12
+        self.workers = os.cpu_count() or 1
+        self.queue_timeout = 1.0
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the hasher from the application settings."""
+        self.shutdown()
+        self.rounds = app.config["BCRYPT_LOG_ROUNDS"]
+        self.workers = app.config["PASSWORD_WORKERS"] or os.cpu_count() or 1
+        self.queue_timeout = app.config["PASSWORD_QUEUE_TIMEOUT"]
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    def hash(self, password):
+        """Return the stored form of a password hashed with the configured cost."""
+        hashed = self._run(_hash, password.encode("utf-8"), self.rounds)
+        return base64.b64encode(hashed).decode("utf-8")
+
+    def hash_many(self, passwords, chunk_size=16):
+        """Return the stored forms of many passwords, hashed across the pool.
+
+        Each chunk of passwords holds a slot while it is hashed, so requests
+        checking a single password still get slots in between. Chunks wait
+        for a slot without timing out.
+        """
+        encoded = [password.encode("utf-8") for password in passwords]
+        executor = self._get_executor()
+        futures = []
+        for start in range(0, len(encoded), chunk_size):
+            # pylint: disable-next=consider-using-with
+            self._slots.acquire()
+            try:
+                future = executor.submit(
+                    _hash_all, encoded[start : start + chunk_size], self.rounds
+                )
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _future: self._slots.release())
+            futures.append(future)
+        return [
+            base64.b64encode(hashed).decode("utf-8")
+            for future in futures
+            for hashed in future.result()
+        ]
+
+    def verify(self, password, password_hash):
+        """Return whether a password matches its stored hash."""
+        hashed = base64.b64decode(password_hash.encode("utf-8"))
+        return self._run(_check, password.encode("utf-8"), hashed)
+
+    def needs_rehash(self, password_hash):
+        """Return whether a stored hash was made with another cost."""
+        return hash_rounds(password_hash) != self.rounds
+
+    def shutdown(self):
+        """Stop the worker processes; the pool restarts on the next use."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _run(self, function, *args):
+        """Run a function in the pool once a slot is free."""
+        # pylint: disable-next=consider-using-with
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.metrics.increment("passwords.rejected")
+            raise PasswordServiceBusy("Password workers are busy")
+        try:
+            return self._get_executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        """Return the process pool, starting it on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_pool_context()
+                )
+            return self._executor
+
+
+PASSWORDS = PasswordHasher()
@@ -1,20 +1,51 @@
 """Message producer service"""
 
+import atexit
+import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import zlib
 from dotenv import load_dotenv
 import pika
+from pika.exceptions import AMQPError
+
+from app.services.content_events import COMPRESSED_ENCODING, CONTENT_TYPE
+from app.services.metrics import METRICS
 
 load_dotenv()
 
+LOGGER = logging.getLogger(__name__)
+
+PROPERTIES = pika.BasicProperties(content_type=CONTENT_TYPE)
+COMPRESSED_PROPERTIES = pika.BasicProperties(
+    content_type=CONTENT_TYPE, content_encoding=COMPRESSED_ENCODING
+)
 
-# pylint: disable=too-few-public-methods
+
+# pylint: disable=too-many-instance-attributes
 class Producer:
-    """Service to produce messages to RabbitMQ."""
+    """Service to produce messages to RabbitMQ.
+
+    Messages are published in batches on the calling thread, which keeps its
+    own long-lived connection and channel, with publisher confirms; a batch
+    is retried as a unit. Content events reach it from the outbox relay and
+    the reindex command: the outbox table is the queue of pending events, so
+    the producer keeps none of its own. Messages larger than
+    ``RABBIT_MQ_COMPRESS_THRESHOLD`` bytes are compressed and flagged with a
+    ``deflate`` content encoding.
+    """
 
-    def __init__(self):
+    def __init__(self, metrics=METRICS):
         """Initialize the producer service."""
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.metrics = metrics
+        self.queue_name = os.environ.get("RABBIT_MQ_QUEUE")
+        self.max_retries = int(os.getenv("RABBIT_MQ_MAX_RETRIES") or "3")
+        self.retry_backoff = float(os.getenv("RABBIT_MQ_RETRY_BACKOFF") or "0.2")
+        self.max_retry_backoff = float(os.getenv("RABBIT_MQ_MAX_RETRY_BACKOFF") or "5")
+        self.compress_threshold = int(
+            os.getenv("RABBIT_MQ_COMPRESS_THRESHOLD") or "1024"
+        )
         self.credentials = pika.PlainCredentials(
             os.getenv("RABBIT_MQ_USERNAME"), os.getenv("RABBIT_MQ_PASSWORD")
         )
@@ -24,17 +55,141 @@ class Producer:
             os.environ.get("RABBIT_MQ_VHOST"),
             self.credentials,
         )
+        self._lock = threading.Lock()
+        self._pid = None
+        self._local = None
+        self._connections = []
+
+    def publish_batch(self, messages):
+        """Publish messages on the calling thread and wait for the broker.
+
+        Every message is confirmed by the broker before this returns. On any
+        failure the whole batch is published again, so consumers may see
+        duplicates but never miss a message; the last error is re-raised once
+        the retries are exhausted.
+        """
+        self._ensure_process_state()
+        if not messages:
+            return
+        started = time.monotonic()
+        self._with_retries(lambda channel: self._publish_confirmed(channel, messages))
+        self.metrics.observe("producer.publish_latency", time.monotonic() - started)
+        self.metrics.increment("producer.published", len(messages))
+
+    def close(self):
+        """Close every connection opened by this process."""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            if connection.is_open:
+                try:
+                    connection.close()
+                except AMQPError:
+                    LOGGER.debug("Ignoring error while closing connection")
 
-    def publish_message(self, message):
-        """Publish a message to RabbitMQ."""
-        self.executor.submit(self._send_message, message)
+    def _ensure_process_state(self):
+        """(Re)build the connection registry for this process.
 
-    def _send_message(self, message):
-        """Send a message to RabbitMQ."""
+        A child created by ``fork`` inherits the parent's sockets; they are
+        discarded, without closing them, so the parent's connections stay
+        untouched.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._local = threading.local()
+            self._connections = []
+            self._pid = pid
+
+    def _get_channel(self):
+        """Return the calling thread's channel, connecting if needed."""
+        local = self._local
+        connection = getattr(local, "connection", None)
+        if connection is not None and connection.is_open:
+            try:
+                # Service heartbeats and detect a connection the broker
+                # dropped while idle, before writing to a dead socket.
+                connection.process_data_events(time_limit=0)
+                if local.channel.is_open:
+                    return local.channel
+            except (AMQPError, OSError):
+                LOGGER.info("RabbitMQ connection went stale, reconnecting")
+        self._reset_connection()
         connection = pika.BlockingConnection(self.connection_params)
         channel = connection.channel()
-        channel.queue_declare(queue=os.environ.get("RABBIT_MQ_QUEUE"))
-        channel.basic_publish(
-            exchange="", routing_key=os.environ.get("RABBIT_MQ_QUEUE"), body=message
-        )
-        connection.close()
+        channel.queue_declare(queue=self.queue_name)
+        local.connection, local.channel = connection, channel
+        with self._lock:
+            self._connections.append(connection)
+        return channel
+
+    def _reset_connection(self):
+        """Drop the calling thread's connection."""
+        local = self._local
+        connection = getattr(local, "connection", None)
+        local.connection = local.channel = None
+        local.confirming = False
+        if connection is None:
+            return
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        if connection.is_open:
+            try:
+                connection.close()
+            except AMQPError:
+                LOGGER.debug("Ignoring error while closing stale connection")
+
+    def _with_retries(self, operation):
+        """Run ``operation(channel)``, reconnecting with backoff on failure."""
+        attempt = 0
+        while True:
+            try:
+                return operation(self._get_channel())
+            except (AMQPError, OSError):
+                self._reset_connection()
+                if attempt >= self.max_retries:
+                    self.metrics.increment("producer.failures")
+                    raise
+                delay = min(self.max_retry_backoff, self.retry_backoff * 2**attempt)
+                attempt += 1
+                self.metrics.increment("producer.retries")
+                LOGGER.warning(
+                    "Publishing to RabbitMQ failed, retry %d/%d in %.2fs",
+                    attempt,
+                    self.max_retries,
+                    delay,
+                )
+                time.sleep(delay)
+
+    def _encode(self, message):
+        """Return the body and properties to publish a message with."""
+        if 0 < self.compress_threshold < len(message):
+            self.metrics.increment("producer.compressed")
+            return zlib.compress(message.encode("utf-8")), COMPRESSED_PROPERTIES
+        return message, PROPERTIES
+
+    def _publish_confirmed(self, channel, messages):
+        """Publish every message of a batch in publisher-confirms mode."""
+        if not getattr(self._local, "confirming", False):
+            channel.confirm_delivery()
+            self._local.confirming = True
+        for message in messages:
+            body, properties = self._encode(message)
+            # Raises NackError/UnroutableError unless the broker confirms.
+            channel.basic_publish(
+                exchange="",
+                routing_key=self.queue_name,
+                body=body,
+                properties=properties,
+                mandatory=True,
+            )
+
+
+PRODUCER = Producer()
+atexit.register(PRODUCER.close)
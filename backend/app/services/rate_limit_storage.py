@@ -0,0 +1,183 @@
+"""Rate limit storage shared by the worker processes of a single host.
+
+Counters live in a memory-mapped file, so every process that maps it sees
+the same counters and the limits hold for the host rather than for each
+worker. Set ``RATELIMIT_STORAGE_URI=mmap:///path/to/file`` to use it; the
+``slots`` and ``stripes`` query parameters size the table.
+
+The file is a fixed-size hash table split into stripes. A key always lives
+in the stripe its hash selects, and each update holds the lock of that
+stripe only: a thread lock within the process and an ``fcntl`` byte-range
+lock across processes. Only fixed-window strategies are supported.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlparse
+from limits.storage import Storage
+
+MAGIC = b"CMSRL001"
+HEADER = struct.Struct("<8sII")
+SLOT = struct.Struct("<Qqd")
+
+
+def key_hash(key):
+    """Return the non-zero 64-bit hash identifying a key in the table."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+# pylint: disable=too-many-instance-attributes
+class SharedMemoryStorage(Storage):
+    """Fixed-window counters in a memory-mapped hash table with striped locks."""
+
+    STORAGE_SCHEME = ["mmap"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        """Map the file named by ``uri``, creating it if needed."""
+        parsed = urlparse(uri)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        self.slots = int(options.get("slots", params.get("slots", 65536)))
+        self.stripes = int(options.get("stripes", params.get("stripes", 64)))
+        if self.slots % self.stripes:
+            raise ValueError("slots must be a multiple of stripes")
+        self.per_stripe = self.slots // self.stripes
+        self.path = parsed.path
+        self.size = HEADER.size + self.slots * SLOT.size
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._initialize()
+        self._map = mmap.mmap(self._fd, self.size)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        """Errors of the storage, wrapped when ``wrap_exceptions`` is set."""
+        return OSError
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        """Add ``amount`` to a counter, starting a window of ``expiry`` seconds."""
+        hashed = key_hash(key)
+        now = time.time()
+        with self._locked(hashed % self.stripes):
+            offset, live = self._find(hashed, now)
+            if live:
+                _, count, expires_at = SLOT.unpack_from(self._map, offset)
+                count += amount
+                if elastic_expiry:
+                    expires_at = now + expiry
+            else:
+                count, expires_at = amount, now + expiry
+            SLOT.pack_into(self._map, offset, hashed, count, expires_at)
+        return count
+
+    def get(self, key):
+        """Return the value of a counter, zero once its window is over."""
+        return self._read(key)[0]
+
+    def get_expiry(self, key):
+        """Return when the window of a counter ends."""
+        expires_at = self._read(key)[1]
+        return int(expires_at if expires_at else time.time())
+
+    def check(self):
+        """Return whether the storage is usable."""
+        return not self._map.closed
+
+    def reset(self):
+        """Clear every counter and return how many were live."""
+        now = time.time()
+        live = 0
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                start = self._slot_offset(stripe, 0)
+                for index in range(self.per_stripe):
+                    offset = start + index * SLOT.size
+                    if SLOT.unpack_from(self._map, offset)[2] > now:
+                        live += 1
+                end = start + self.per_stripe * SLOT.size
+                self._map[start:end] = bytes(end - start)
+        return live
+
+    def clear(self, key):
+        """Clear a counter."""
+        hashed = key_hash(key)
+        with self._locked(hashed % self.stripes):
+            offset, live = self._find(hashed, time.time())
+            if live:
+                SLOT.pack_into(self._map, offset, hashed, 0, 0.0)
+
+    def close(self):
+        """Unmap the file."""
+        self._map.close()
+        os.close(self._fd)
+
+    def _initialize(self):
+        """Size and stamp the file unless another process already did."""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, HEADER.size, 0)
+        try:
+            header = os.pread(self._fd, HEADER.size, 0)
+            if header != HEADER.pack(MAGIC, self.slots, self.stripes):
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self.size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, self.slots, self.stripes), 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, HEADER.size, 0)
+
+    def _read(self, key):
+        """Return the count and window end of a key, zeros if not live."""
+        hashed = key_hash(key)
+        now = time.time()
+        with self._locked(hashed % self.stripes):
+            offset, live = self._find(hashed, now)
+            if not live:
+                return 0, 0.0
+            _, count, expires_at = SLOT.unpack_from(self._map, offset)
+        return count, expires_at
+
+    def _find(self, hashed, now):
+        """Return the slot of a key in its stripe and whether it is live.
+
+        Probing stops at the key or at a never used slot; otherwise the key
+        takes the first expired slot seen, or the one expiring soonest when
+        the stripe is full.
+        """
+        stripe = hashed % self.stripes
+        start = (hashed // self.stripes) % self.per_stripe
+        reusable = soonest = None
+        soonest_expiry = float("inf")
+        for probe in range(self.per_stripe):
+            offset = self._slot_offset(stripe, (start + probe) % self.per_stripe)
+            slot_hash, _, expires_at = SLOT.unpack_from(self._map, offset)
+            if slot_hash == hashed and expires_at > now:
+                return offset, True
+            if slot_hash == 0:
+                return (offset if reusable is None else reusable), False
+            if expires_at <= now:
+                if reusable is None:
+                    reusable = offset
+            elif expires_at < soonest_expiry:
+                soonest, soonest_expiry = offset, expires_at
+        return (soonest if reusable is None else reusable), False
+
+    def _slot_offset(self, stripe, index):
+        """Return the offset of a slot in the file."""
+        return HEADER.size + (stripe * self.per_stripe + index) * SLOT.size
+
+    @contextmanager
+    def _locked(self, stripe):
+        """Hold the lock of a stripe, within and across processes."""
+        start = self._slot_offset(stripe, 0)
+        length = self.per_stripe * SLOT.size
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
@@ -0,0 +1,195 @@
+"""Streaming reindex of the whole content corpus to the message queue."""
+
+import json
+import os
+import queue
+import threading
+import time
+from sqlalchemy import select
+
+from app.extensions import DB as db
+from app.models.content import Content
+from app.services.content_events import create_event, publishable_message
+
+PAGES_PER_QUERY = 10
+
+
+# pylint: disable=too-few-public-methods
+class RateLimiter:
+    """Spread events evenly so that at most ``rate`` are let through per second."""
+
+    def __init__(self, rate):
+        """Initialize a limiter; a rate of zero or less disables it."""
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_at = time.monotonic()
+
+    def acquire(self, count):
+        """Wait until ``count`` more events may be sent."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next_at, now)
+            self._next_at = start + count / self.rate
+        time.sleep(max(start - now, 0))
+
+
+# pylint: disable=too-many-instance-attributes
+class Reindexer:
+    """Publish a create event for every live content, in id order.
+
+    Contents are read by keyset over their primary key, one query per
+    ``PAGES_PER_QUERY`` batches streamed from a server-side cursor, so
+    memory stays constant whatever the size of the table. Batches are
+    published with confirms by ``workers`` threads. The checkpoint records
+    the last id of the longest run of confirmed batches, so a resumed
+    reindex may publish a few batches twice but never skips one.
+    """
+
+    def __init__(
+        self,
+        producer,
+        batch_size=500,
+        workers=4,
+        rate=0,
+        checkpoint_path=None,
+        updated_since=None,
+    ):  # pylint: disable=too-many-arguments
+        """Initialize a reindex publishing through ``producer``."""
+        self.producer = producer
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.checkpoint_path = checkpoint_path
+        self.updated_since = updated_since
+        self.published = 0
+        self.last_id = None
+        self._lock = threading.Lock()
+        self._confirmed = {}
+        self._next_sequence = 0
+        self._error = None
+
+    def count(self):
+        """Return the number of contents left to publish."""
+        query = select(db.func.count(Content.id)).where(*self._filters(self.last_id))
+        return db.session.execute(query).scalar()
+
+    def resume(self):
+        """Continue after the checkpoint, if there is one; return whether there was."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, encoding="utf-8") as checkpoint:
+            state = json.load(checkpoint)
+        self.last_id = state["last_id"]
+        self.published = state["published"]
+        return True
+
+    def run(self, on_progress=None):
+        """Publish every remaining content; return the number of events published.
+
+        ``on_progress`` is called with the size of every confirmed batch. The
+        first publishing error stops the reindex and is re-raised.
+        """
+        batches = queue.Queue(maxsize=self.workers * 2)
+        threads = [
+            threading.Thread(
+                target=self._publish, args=(batches, on_progress), daemon=True
+            )
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for sequence, batch in enumerate(self._batches()):
+                if self._error is not None:
+                    break
+                batches.put((sequence, batch))
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.published
+
+    def _filters(self, after):
+        """Return the conditions selecting the contents to publish after an id."""
+        filters = [Content.deleted_at.is_(None)]
+        if self.updated_since is not None:
+            filters.append(Content.updated_at >= self.updated_since)
+        if after is not None:
+            filters.append(Content.id > after)
+        return filters
+
+    def _batches(self):
+        """Yield batches of ``(id, event)`` pairs in id order."""
+        last_id = self.last_id
+        while True:
+            query = (
+                select(Content.id, Content.title, Content.body)
+                .where(*self._filters(last_id))
+                .order_by(Content.id)
+                .limit(self.batch_size * PAGES_PER_QUERY)
+                .execution_options(stream_results=True, yield_per=self.batch_size)
+            )
+            rows = 0
+            for partition in db.session.execute(query).partitions():
+                rows += len(partition)
+                last_id = partition[-1].id
+                yield [
+                    (row.id, publishable_message(create_event(row)))
+                    for row in partition
+                ]
+            # Do not hold a snapshot open between queries.
+            db.session.rollback()
+            if rows < self.batch_size * PAGES_PER_QUERY:
+                return
+
+    def _publish(self, batches, on_progress):
+        """Publish batches from the queue until told to stop."""
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            sequence, batch = item
+            try:
+                self.limiter.acquire(len(batch))
+                self.producer.publish_batch([event for _id, event in batch])
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self._error = error
+                continue
+            self._confirm(sequence, batch, on_progress)
+
+    def _confirm(self, sequence, batch, on_progress):
+        """Advance the checkpoint over every batch confirmed in sequence."""
+        with self._lock:
+            self._confirmed[sequence] = batch
+            advanced = False
+            while self._next_sequence in self._confirmed:
+                confirmed = self._confirmed.pop(self._next_sequence)
+                self._next_sequence += 1
+                self.published += len(confirmed)
+                self.last_id = confirmed[-1][0]
+                advanced = True
+            if advanced and self.checkpoint_path:
+                self._write_checkpoint()
+            if on_progress is not None:
+                on_progress(len(batch))
+
+    def _write_checkpoint(self):
+        """Atomically record how far the reindex got; the lock must be held."""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as checkpoint:
+            json.dump(
+                {"last_id": self.last_id, "published": self.published}, checkpoint
+            )
+        os.replace(temporary, self.checkpoint_path)
@@ -0,0 +1,63 @@
+"""Changes to the tables of databases created by earlier versions.
+
+``db.create_all()`` creates the missing tables but never alters existing
+ones, so the columns and indexes added to existing tables since are listed
+here and applied by ``flask schema upgrade``. Changes already applied are
+skipped, so the command can run on every deploy.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app.extensions import DB as db
+from app.models.comment import Comment
+from app.models.content import Content
+from app.models.user import User
+
+# (table, column name) added to tables created by earlier versions.
+ADDED_COLUMNS = (
+    (User.__table__, "token_version"),
+    (Content.__table__, "excerpt"),
+)
+# (table, index name) added to tables created by earlier versions.
+ADDED_INDEXES = (
+    (Content.__table__, "ix_contents_updated_at_id"),
+    (Content.__table__, "ix_contents_deleted_at_created_at_id"),
+    (User.__table__, "ix_users_deleted_at_id"),
+    (User.__table__, "ix_users_last_name"),
+    (Comment.__table__, "ix_comments_content_id_deleted_at_created_at"),
+)
+
+
+def pending_schema_changes():
+    """Return the DDL statements the database still needs, in order."""
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    statements = []
+    for table, name in ADDED_COLUMNS:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        if name not in existing:
+            column = CreateColumn(table.c[name]).compile(dialect=dialect)
+            statements.append(
+                f"ALTER TABLE {dialect.identifier_preparer.format_table(table)}"
+                f" ADD COLUMN {column}"
+            )
+    for table, name in ADDED_INDEXES:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        if name not in existing:
+            (index,) = [index for index in table.indexes if index.name == name]
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return statements
+
+
+def upgrade_schema():
+    """Apply the pending schema changes; return the statements run."""
+    statements = pending_schema_changes()
+    with db.engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+    return statements
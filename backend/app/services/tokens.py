@@ -0,0 +1,182 @@
+"""Access and refresh tokens of users, and their revocation."""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import event, select
+
+from app.extensions import DB as db
+from app.models.refresh_token import RefreshToken
+from app.models.token_revocation import TokenRevocation
+
+
+def create_user_access_token(user):
+    """Return an access token for a user.
+
+    With ``JWT_ROLE_CLAIMS`` enabled, the token also carries the role and
+    the token version of the user, so that requests can be authorized
+    without loading the user.
+    """
+    claims = None
+    if current_app.config["JWT_ROLE_CLAIMS"]:
+        claims = {"role": user.role, "ver": user.token_version}
+    return create_access_token(identity=user.id, additional_claims=claims)
+
+
+def issue_tokens(user, family=None):
+    """Return a new access token and refresh token for a user.
+
+    The refresh token is recorded with the current transaction. Tokens
+    rotated from one another share a ``family``, started at login.
+    """
+    now = datetime.now()
+    RefreshToken.query.filter(
+        RefreshToken.user_id == user.id, RefreshToken.expires_at < now
+    ).delete(synchronize_session=False)
+    jti = str(uuid4())
+    family = family or str(uuid4())
+    refresh_token = create_refresh_token(
+        identity=user.id, additional_claims={"jti": jti, "family": family}
+    )
+    expires_at = now + current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+    db.session.add(RefreshToken(jti, user.id, family, expires_at))
+    return {
+        "access_token": create_user_access_token(user),
+        "refresh_token": refresh_token,
+    }
+
+
+def use_refresh_token(jti):
+    """Mark a refresh token as used and return whether it was still valid.
+
+    Presenting a token that was already used means it leaked, so the whole
+    family it belongs to is revoked.
+    """
+    now = datetime.now()
+    claimed = RefreshToken.query.filter(
+        RefreshToken.jti == jti,
+        RefreshToken.used_at.is_(None),
+        RefreshToken.revoked_at.is_(None),
+    ).update({"used_at": now}, synchronize_session=False)
+    if claimed:
+        return True
+    token = db.session.get(RefreshToken, jti)
+    if token is not None:
+        revoke_refresh_tokens(token.family)
+    return False
+
+
+def revoke_refresh_tokens(family):
+    """Revoke every refresh token of a family, with the current transaction."""
+    RefreshToken.query.filter(
+        RefreshToken.family == family, RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": datetime.now()}, synchronize_session=False)
+
+
+class TokenRevocations:
+    """Minimum token version of the users whose tokens were recently revoked.
+
+    Revoking bumps the token version of a user and records it in the
+    ``token_revocations`` table, which every process reads into a small
+    in-memory map at most every ``JWT_REVOCATION_SYNC_INTERVAL`` seconds.
+    Rows are read by creation time, going back ``JWT_REVOCATION_SYNC_OVERLAP``
+    seconds before the previous sync so that revocations committed after
+    rows created later are not skipped. Revocations older than the lifetime
+    of access tokens are forgotten, as the tokens they revoke have expired
+    anyway.
+    """
+
+    def __init__(self):
+        """Initialize an empty revocation map; ``init_app`` applies the settings."""
+        self.interval = 1.0
+        self.retention = None
+        self.overlap = timedelta(0)
+        self._minimum = {}
+        self._synced_since = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the revocations from the application settings."""
+        self.interval = app.config["JWT_REVOCATION_SYNC_INTERVAL"]
+        self.retention = app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+        self.overlap = timedelta(seconds=app.config["JWT_REVOCATION_SYNC_OVERLAP"])
+        if not event.contains(db.session, "after_commit", self._after_commit):
+            event.listen(db.session, "after_commit", self._after_commit)
+            event.listen(db.session, "after_rollback", self._after_rollback)
+        with self._lock:
+            self._minimum.clear()
+            self._synced_since = None
+            self._synced_at = 0.0
+
+    def revoke(self, user):
+        """Revoke every token issued to a user so far, with the current transaction.
+
+        This process applies the revocation once the transaction commits.
+        """
+        TokenRevocation.query.filter(
+            TokenRevocation.created_at < datetime.now() - self.retention
+        ).delete(synchronize_session=False)
+        user.token_version = (user.token_version or 0) + 1
+        db.session.add(TokenRevocation(user.id, user.token_version))
+        db.session.info.setdefault("token_revocations", []).append(
+            (user.id, user.token_version)
+        )
+
+    def is_revoked(self, user_id, token_version):
+        """Return whether a token of the given version was revoked."""
+        self._sync()
+        entry = self._minimum.get(user_id)
+        return entry is not None and token_version < entry[0]
+
+    def _sync(self):
+        """Read the revocations recorded since the last sync, if it is due."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._synced_at < self.interval:
+                return
+            self._synced_at = now
+            synced_since = self._synced_since
+        started = datetime.now()
+        oldest = started - self.retention
+        since = oldest
+        if synced_since is not None:
+            since = max(oldest, synced_since - self.overlap)
+        rows = db.session.execute(
+            select(
+                TokenRevocation.user_id,
+                TokenRevocation.token_version,
+                TokenRevocation.created_at,
+            ).where(TokenRevocation.created_at >= since)
+        ).all()
+        for row in rows:
+            self._record(row.user_id, row.token_version, row.created_at)
+        with self._lock:
+            self._synced_since = started
+            for user_id, (_version, created_at) in list(self._minimum.items()):
+                if created_at < oldest:
+                    del self._minimum[user_id]
+
+    def _after_commit(self, session):
+        """Apply the revocations of a committed transaction."""
+        now = datetime.now()
+        for user_id, token_version in session.info.pop("token_revocations", ()):
+            self._record(user_id, token_version, now)
+
+    @staticmethod
+    def _after_rollback(session):
+        """Forget the revocations of a rolled back transaction."""
+        session.info.pop("token_revocations", None)
+
+    def _record(self, user_id, token_version, created_at):
+        """Raise the minimum token version of a user."""
+        with self._lock:
+            entry = self._minimum.get(user_id)
+            if entry is None or entry[0] < token_version:
+                self._minimum[user_id] = (token_version, created_at)
+
+
+TOKEN_REVOCATIONS = TokenRevocations()
@@ -0,0 +1,187 @@
+"""Bulk provisioning of users from CSV or NDJSON uploads.
+
+Rows are processed in batches: each batch is validated, checked for taken
+usernames and emails with one query per column, hashed across the password
+worker pool and inserted in a single transaction. Every row gets a result,
+so a partly invalid upload still creates its valid users.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import DB as db
+from app.models.user import User
+from app.services.passwords import PASSWORDS
+from app.utils.user_factory import USER_CLASSES
+
+REQUIRED_FIELDS = ("username", "password", "first_name", "last_name", "email")
+CSV_CONTENT_TYPE = "text/csv"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+def read_rows(stream, content_type):
+    """Yield the rows of an upload as ``(row number, data or error)`` pairs.
+
+    Raises ValueError for content types other than CSV and NDJSON.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if content_type == CSV_CONTENT_TYPE:
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, {key: value for key, value in row.items() if value}
+    elif content_type in NDJSON_CONTENT_TYPES:
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield number, "Invalid JSON"
+                continue
+            yield number, row if isinstance(row, dict) else "Expected a JSON object"
+    else:
+        raise ValueError(f"Unsupported content type: {content_type}")
+
+
+class UserProvisioner:
+    """Create users from rows in batches, keeping a result per row."""
+
+    def __init__(self, batch_size):
+        """Initialize a provisioner."""
+        self.batch_size = batch_size
+        self.results = []
+        self._usernames = set()
+        self._emails = set()
+
+    def run(self, rows):
+        """Provision every row and return the results."""
+        batch = []
+        for number, row in rows:
+            error = self._validate(row)
+            if error:
+                self._report(number, row, error=error)
+                continue
+            batch.append((number, row))
+            if len(batch) == self.batch_size:
+                self._provision(batch)
+                batch = []
+        if batch:
+            self._provision(batch)
+        self.results.sort(key=lambda result: result["row"])
+        return self.results
+
+    def summary(self):
+        """Return how many rows were created and how many failed."""
+        created = sum(1 for result in self.results if result["status"] == "created")
+        return {"created": created, "failed": len(self.results) - created}
+
+    def _validate(self, row):
+        """Return why a row cannot be provisioned, if it cannot."""
+        if not isinstance(row, dict):
+            return row
+        missing = [
+            field
+            for field in REQUIRED_FIELDS
+            if not row.get(field) or not isinstance(row[field], str)
+        ]
+        if missing:
+            return f"Missing or invalid fields: {', '.join(missing)}"
+        if row["username"] in self._usernames:
+            return "Duplicate username in upload"
+        if row["email"] in self._emails:
+            return "Duplicate email in upload"
+        self._usernames.add(row["username"])
+        self._emails.add(row["email"])
+        return None
+
+    def _provision(self, batch):
+        """Insert the rows of a batch whose username and email are free."""
+        taken_usernames = set(
+            db.session.scalars(
+                select(User.username).where(
+                    User.username.in_([row["username"] for _, row in batch])
+                )
+            )
+        )
+        taken_emails = set(
+            db.session.scalars(
+                select(User.email).where(
+                    User.email.in_([row["email"] for _, row in batch])
+                )
+            )
+        )
+        free = []
+        for number, row in batch:
+            if row["username"] in taken_usernames:
+                self._report(number, row, error="User already exists")
+            elif row["email"] in taken_emails:
+                self._report(number, row, error="Email already in use")
+            else:
+                free.append((number, row))
+        if not free:
+            return
+        hashes = PASSWORDS.hash_many([row["password"] for _, row in free])
+        records = [
+            self._record(row, password_hash)
+            for (_, row), password_hash in zip(free, hashes)
+        ]
+        try:
+            db.session.execute(insert(User), records)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request took a name: insert one by one instead.
+            db.session.rollback()
+            self._insert_each(free, records)
+            return
+        for (number, row), record in zip(free, records):
+            self._report(number, row, user_id=record["id"])
+
+    def _insert_each(self, rows, records):
+        """Insert rows one savepoint at a time, reporting conflicts per row."""
+        for (number, row), record in zip(rows, records):
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(User), [record])
+            except IntegrityError:
+                self._report(number, row, error="User already exists")
+            else:
+                self._report(number, row, user_id=record["id"])
+        db.session.commit()
+
+    @staticmethod
+    def _record(row, password_hash):
+        """Return the column values of a new user."""
+        now = datetime.now()
+        role = str(row.get("role", "regular")).lower()
+        return {
+            "id": str(uuid4()),
+            "username": row["username"],
+            "first_name": row["first_name"],
+            "middle_name": row.get("middle_name", ""),
+            "last_name": row["last_name"],
+            "email": row["email"],
+            "phone_number": row.get("phone_number", ""),
+            "password_hash": password_hash,
+            "role": role if role in USER_CLASSES else "regular",
+            "status": True,
+            "token_version": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    def _report(self, number, row, user_id=None, error=None):
+        """Record the result of a row."""
+        result = {"row": number, "status": "created" if error is None else "error"}
+        if isinstance(row, dict) and row.get("username"):
+            result["username"] = row["username"]
+        if error is None:
+            result["id"] = user_id
+        else:
+            result["error"] = error
+        self.results.append(result)
@@ -0,0 +1,268 @@
+"""Integration tests for the request-scoped identity"""
+
+import json
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models.auth_invalidation import AuthInvalidation
+from app.models.content import Content
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+from app.extensions import DB as db
+from app.services.auth_cache import AUTH_CACHE, AuthCache, DatabaseInvalidations
+from app.services.metrics import Metrics
+from app.services.tokens import TOKEN_REVOCATIONS, TokenRevocations
+from app.tests.integration.base_test_class import BaseTestCase
+
+
+class AuthorizationIntegrationTestCase(BaseTestCase):
+    """Integration tests for the request-scoped identity"""
+
+    def setUp(self):
+        """Seed users, a content and a comment"""
+        super().setUp()
+        admin_user = self.create_admin_user()
+        editor_user = self.create_editor_user()
+        regular_user = self.create_regular_user()
+        content = Content(title="Content", body="Body.")
+        db.session.add_all([admin_user, editor_user, regular_user, content])
+        db.session.commit()
+        self.admin_user_id = admin_user.id
+        self.editor_user_id = editor_user.id
+        self.regular_user_id = regular_user.id
+        self.content_id = content.id
+        response = self.client.post(
+            "/comments",
+            headers=self.get_auth_headers(self.regular_user_id),
+            json={"content_id": self.content_id, "comment_text": "A comment."},
+        )
+        self.comment_id = json.loads(response.data)["payload"]["id"]
+
+    @contextmanager
+    def count_user_queries(self, table="users"):
+        """Count the statements reading a table, the users table by default"""
+        statements = []
+
+        def record(_conn, _cursor, statement, *_args):
+            if f"FROM {table}" in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+    def test_protected_endpoints_load_the_user_once(self):
+        """Test that every protected endpoint makes exactly one user lookup"""
+        requests = [
+            ("get", "/contents", self.regular_user_id, None),
+            ("post", "/contents", self.editor_user_id, {"title": "T", "body": "B"}),
+            ("get", f"/users/{self.regular_user_id}", self.regular_user_id, None),
+            ("get", "/users", self.admin_user_id, None),
+            (
+                "put",
+                f"/comments/{self.comment_id}",
+                self.regular_user_id,
+                {"comment_text": "Edited."},
+            ),
+            ("delete", f"/comments/{self.comment_id}", self.admin_user_id, None),
+        ]
+        for method, url, user_id, body in requests:
+            with self.subTest(method=method, url=url):
+                AUTH_CACHE.clear()
+                with self.count_user_queries() as statements:
+                    response = getattr(self.client, method)(
+                        url, headers=self.get_auth_headers(user_id), json=body
+                    )
+                self.assertLess(response.status_code, 300)
+                # Resources may still query the users they operate on.
+                lookups = [s for s in statements if s.endswith("WHERE users.id = ?")]
+                self.assertEqual(len(lookups), 1, statements)
+
+    def test_mutating_endpoints_load_their_entity_once(self):
+        """Test that the entity checked by the middleware is handed to the resource"""
+        editor = self.get_auth_headers(self.editor_user_id)
+        admin = self.get_auth_headers(self.admin_user_id)
+        requests = [
+            ("put", f"/comments/{self.comment_id}", "comments", {"comment_text": "E"}),
+            ("delete", f"/comments/{self.comment_id}", "comments", None),
+            ("put", f"/contents/{self.content_id}", "contents", {"title": "New"}),
+            ("delete", f"/contents/{self.content_id}", "contents", None),
+            ("put", f"/users/{self.editor_user_id}", "users", {"role": "regular"}),
+            ("delete", f"/users/{self.regular_user_id}", "users", None),
+        ]
+        owner = self.get_auth_headers(self.regular_user_id)
+        headers = {"comments": owner, "contents": editor, "users": admin}
+        for method, url, table, body in requests:
+            with self.subTest(method=method, url=url):
+                with self.count_user_queries(table) as statements:
+                    response = getattr(self.client, method)(
+                        url, headers=headers[table], json=body
+                    )
+                self.assertLess(response.status_code, 300)
+                # Reloads of expired attributes after the commit don't count.
+                loads = [s for s in statements if f"{table}.deleted_at IS NULL" in s]
+                self.assertEqual(len(loads), 1, statements)
+
+    def test_cached_record_is_reused_until_invalidated(self):
+        """Test that later requests skip the lookup and role changes apply at once"""
+        headers = self.get_auth_headers(self.regular_user_id)
+        self.client.get("/contents", headers=headers)
+        with self.count_user_queries() as statements:
+            self.client.get("/contents", headers=headers)
+        self.assertEqual(statements, [])
+
+        self.client.put(
+            f"/users/{self.regular_user_id}",
+            headers=self.get_auth_headers(self.admin_user_id),
+            json={"role": "editor"},
+        )
+        response = self.client.post(
+            "/contents", headers=headers, json={"title": "T", "body": "B"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_deleted_user_is_rejected(self):
+        """Test that the token of a deleted user no longer authenticates"""
+        headers = self.get_auth_headers(self.regular_user_id)
+        self.assertEqual(self.client.get("/contents", headers=headers).status_code, 200)
+        self.client.delete(
+            f"/users/{self.regular_user_id}",
+            headers=self.get_auth_headers(self.admin_user_id),
+        )
+        self.assertEqual(self.client.get("/contents", headers=headers).status_code, 401)
+
+    def test_rejections_are_401_outside_testing(self):
+        """Test that lookup failures are not turned into 500s in production"""
+        self.app.config["TESTING"] = False
+        self.addCleanup(self.app.config.update, TESTING=True)
+        headers = self.get_auth_headers(self.regular_user_id)
+        self.client.delete(
+            f"/users/{self.regular_user_id}",
+            headers=self.get_auth_headers(self.admin_user_id),
+        )
+        for path in (f"/users/{self.regular_user_id}", "/contents"):
+            response = self.client.get(path, headers=headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(
+                json.loads(response.data)["error"],
+                "Invalid or missing authentication token.",
+            )
+
+    def test_cache_is_bounded_and_shares_invalidations(self):
+        """Test LRU eviction and invalidations seen by another process"""
+        self.app.config["AUTH_CACHE_BACKEND"] = "database"
+        AUTH_CACHE.init_app(self.app)
+        self.addCleanup(AUTH_CACHE.init_app, self.app)
+        self.addCleanup(self.app.config.update, AUTH_CACHE_BACKEND="memory")
+        metrics = Metrics()
+        other = AuthCache(metrics=metrics)
+        other.maxsize = 1
+        other.invalidations = DatabaseInvalidations(
+            0, timedelta(minutes=1), timedelta(seconds=10)
+        )
+        other.get(self.admin_user_id)
+        other.get(self.regular_user_id)
+        self.assertEqual(metrics.snapshot()["auth_cache.evictions"], 1)
+        self.assertEqual(other.get(self.regular_user_id).role, "regular")
+
+        self.client.put(
+            f"/users/{self.regular_user_id}",
+            headers=self.get_auth_headers(self.admin_user_id),
+            json={"role": "editor"},
+        )
+        self.assertEqual(other.get(self.regular_user_id).role, "editor")
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["auth_cache.hits"], 1)
+        self.assertEqual(snapshot["auth_cache.misses"], 3)
+
+    def test_syncs_read_rows_committed_late(self):
+        """Test that rows created before the last sync are still picked up"""
+        invalidations = DatabaseInvalidations(
+            0, timedelta(minutes=1), timedelta(seconds=10)
+        )
+        revocations = TokenRevocations()
+        revocations.init_app(self.app)
+        revocations.interval = 0
+        self.assertEqual(invalidations.poll(), [])
+        self.assertEqual(invalidations.poll(), [])
+        self.assertFalse(revocations.is_revoked(self.editor_user_id, 0))
+
+        late = datetime.now() - timedelta(seconds=5)
+        invalidation = AuthInvalidation(self.editor_user_id)
+        revocation = TokenRevocation(self.editor_user_id, 1)
+        invalidation.created_at = revocation.created_at = late
+        db.session.add_all([invalidation, revocation])
+        db.session.commit()
+        self.assertEqual(invalidations.poll(), [self.editor_user_id])
+        self.assertEqual(invalidations.poll(), [])
+        self.assertTrue(revocations.is_revoked(self.editor_user_id, 0))
+
+    def test_revocations_apply_once_committed(self):
+        """Test that a rolled back revocation is not applied"""
+        user = db.session.get(User, self.editor_user_id)
+        TOKEN_REVOCATIONS.revoke(user)
+        db.session.rollback()
+        db.session.commit()
+        self.assertFalse(TOKEN_REVOCATIONS.is_revoked(self.editor_user_id, 0))
+        TOKEN_REVOCATIONS.revoke(db.session.get(User, self.editor_user_id))
+        db.session.commit()
+        self.assertTrue(TOKEN_REVOCATIONS.is_revoked(self.editor_user_id, 0))
+
+    def login(self, user_id, password):
+        """Log a user in and return the authentication headers"""
+        username = db.session.get(User, user_id).username
+        response = self.client.post(
+            "/login", json={"username": username, "password": password}
+        )
+        access_token = json.loads(response.data)["payload"]["access_token"]
+        return {"Authorization": f"Bearer {access_token}"}
+
+    def test_role_claims_skip_the_lookup_until_revoked(self):
+        """Test that role claims authorize alone and role changes revoke them"""
+        self.app.config["JWT_ROLE_CLAIMS"] = True
+        self.addCleanup(self.app.config.update, JWT_ROLE_CLAIMS=False)
+        headers = self.login(self.editor_user_id, "editorpass")
+        admin_headers = self.login(self.admin_user_id, "adminpass")
+        other = TokenRevocations()
+        other.init_app(self.app)
+        other.interval = 0
+        self.assertFalse(other.is_revoked(self.editor_user_id, 0))
+
+        AUTH_CACHE.clear()
+        with self.count_user_queries() as statements:
+            response = self.client.post(
+                "/contents", headers=headers, json={"title": "T", "body": "B"}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(statements, [])
+
+        self.client.put(
+            f"/users/{self.editor_user_id}",
+            headers=admin_headers,
+            json={"role": "regular"},
+        )
+        self.assertTrue(TOKEN_REVOCATIONS.is_revoked(self.editor_user_id, 0))
+        self.assertTrue(other.is_revoked(self.editor_user_id, 0))
+        self.assertEqual(self.client.get("/contents", headers=headers).status_code, 401)
+
+        headers = self.login(self.editor_user_id, "editorpass")
+        self.assertEqual(self.client.get("/contents", headers=headers).status_code, 200)
+        response = self.client.post(
+            "/contents", headers=headers, json={"title": "T", "body": "B"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+        self.client.delete(f"/users/{self.editor_user_id}", headers=admin_headers)
+        self.assertEqual(self.client.get("/contents", headers=headers).status_code, 401)
+        username = db.session.get(User, self.editor_user_id).username
+        response = self.client.post(
+            "/login", json={"username": username, "password": "editorpass"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -25,6 +25,7 @@ class BaseTestCase(unittest.TestCase):
         self.app.config["TESTING"] = True
         self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + self.db_path
         self.app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        self.app.config["OUTBOX_RELAY_ENABLED"] = False
         self.client = self.app.test_client()
         self.app_context = self.app.app_context()
         self.app_context.push()
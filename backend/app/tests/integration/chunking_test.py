@@ -0,0 +1,90 @@
+"""Integration tests for content passage chunking"""
+
+import json
+import unittest
+from app.extensions import DB as db
+from app.models.content_chunk import ContentChunk
+from app.models.outbox import OutboxEvent
+from app.services.content_events import publishable_message
+from app.services.chunking import MAX_CHUNK_CHARS, chunk_body, diff_chunks
+from app.tests.integration.base_test_class import BaseTestCase
+
+BODY = "First paragraph.\n\nSecond paragraph.\n\n  Third paragraph.  "
+
+
+class ChunkingTestCase(unittest.TestCase):
+    """Tests for splitting bodies into passages"""
+
+    def test_paragraphs_become_passages(self):
+        """Test that passages are stripped paragraphs with offsets in the body"""
+        passages = chunk_body(BODY)
+        self.assertEqual(
+            [BODY[passage.start : passage.end] for passage in passages],
+            ["First paragraph.", "Second paragraph.", "Third paragraph."],
+        )
+
+    def test_long_paragraphs_are_split_between_sentences(self):
+        """Test that no passage exceeds the maximum size"""
+        sentence = "A sentence of about forty characters. "
+        body = sentence * 60 + "x" * (MAX_CHUNK_CHARS + 10)
+        passages = chunk_body(body)
+        self.assertTrue(
+            all(passage.end - passage.start <= MAX_CHUNK_CHARS for passage in passages)
+        )
+        self.assertTrue(all(body[passage.end - 1] == "." for passage in passages[:2]))
+
+    def test_diff_lists_only_what_changed(self):
+        """Test that an edit reports changed, added, moved and removed passages"""
+        edited = "New opening.\n\nFirst paragraph.\n\nSecond paragraph, edited."
+        diff = diff_chunks(BODY, edited)
+        self.assertEqual([entry["position"] for entry in diff["added"]], [0])
+        self.assertEqual([entry["position"] for entry in diff["moved"]], [1])
+        self.assertEqual(
+            [edited[entry["start"] : entry["end"]] for entry in diff["changed"]],
+            ["Second paragraph, edited."],
+        )
+        self.assertEqual(diff["changed"][0]["previous"], chunk_body(BODY)[2].hash)
+        self.assertEqual([entry["position"] for entry in diff["removed"]], [1])
+        self.assertEqual(diff_chunks(BODY, BODY), {})
+
+
+class ContentChunkIntegrationTestCase(BaseTestCase):
+    """Integration tests for the chunk table and chunk events"""
+
+    def test_chunks_are_stored_and_sent_with_events(self):
+        """Test that writes keep the chunk table and events in sync"""
+        editor_user = self.create_editor_user()
+        db.session.add(editor_user)
+        db.session.commit()
+        headers = self.get_auth_headers(editor_user.id)
+        response = self.client.post(
+            "/contents", headers=headers, json={"title": "Chunked", "body": BODY}
+        )
+        content_id = json.loads(response.data)["payload"]["id"]
+        self.assertEqual(ContentChunk.query.filter_by(content_id=content_id).count(), 3)
+
+        self.client.put(
+            f"/contents/{content_id}",
+            headers=headers,
+            json={"body": BODY.replace("Third", "Last")},
+        )
+        chunks = (
+            ContentChunk.query.filter_by(content_id=content_id)
+            .order_by(ContentChunk.position)
+            .all()
+        )
+        self.assertEqual(chunks[2].text, "Last paragraph.")
+        create, update = [
+            json.loads(publishable_message(event.payload))
+            for event in OutboxEvent.query.order_by(OutboxEvent.id).all()
+        ]
+        self.assertEqual(len(create["chunks"]["added"]), 3)
+        self.assertEqual(list(update["chunks"]), ["changed"])
+        self.assertEqual(update["chunks"]["changed"][0]["hash"], chunks[2].hash)
+
+        self.client.delete(f"/contents/{content_id}", headers=headers)
+        self.assertEqual(ContentChunk.query.filter_by(content_id=content_id).count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
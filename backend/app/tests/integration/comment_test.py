@@ -2,6 +2,9 @@
 
 import unittest
 import json
+from datetime import datetime
+from sqlalchemy import event
+from app.models.comment import Comment
 from app.models.content import Content
 from app.extensions import DB as db
 from app.tests.integration.base_test_class import BaseTestCase
@@ -171,6 +174,135 @@ class CommentIntegrationTestCase(BaseTestCase):
                 content["comments"][0]["comment_text"], "This is a test comment."
             )
 
+    def test_content_list_loads_live_comments_in_one_query(self):
+        """Test that a page loads its live comments at once, and only if asked"""
+        with self.app.app_context():
+            contents = [Content(title=f"Content {i}", body="Body.") for i in range(3)]
+            db.session.add_all(contents)
+            db.session.flush()
+            comments = [
+                Comment(self.regular_user_id, content.id, f"On {content.title}")
+                for content in contents
+            ]
+            comments[0].deleted_at = datetime.now()
+            db.session.add_all(comments)
+            db.session.commit()
+            content_id = contents[1].id
+        statements = []
+
+        def record(_conn, _cursor, statement, *_args):
+            if "comments.comment_text" in statement:
+                statements.append(statement)
+
+        headers = self.get_auth_headers(self.regular_user_id)
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            response = self.client.get("/contents", headers=headers)
+            self.assertEqual(len(statements), 1)
+            statements.clear()
+            sparse = self.client.get(
+                "/contents?fields=id,title&include=", headers=headers
+            )
+            self.assertEqual(statements, [])
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+        texts = sorted(
+            comment["comment_text"]
+            for content in json.loads(response.data)["payload"]
+            for comment in content["comments"]
+        )
+        self.assertEqual(texts, ["On Content 1", "On Content 2"])
+        self.assertEqual(
+            {frozenset(content) for content in json.loads(sparse.data)["payload"]},
+            {frozenset(("id", "title"))},
+        )
+        response = self.client.get("/contents?fields=secret", headers=headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            f"/contents/{content_id}?fields=title", headers=headers
+        )
+        self.assertEqual(json.loads(response.data)["payload"], {"title": "Content 1"})
+        response = self.client.get(
+            f"/contents/{content_id}?fields=title&include=comments",
+            headers=headers,
+        )
+        self.assertEqual(
+            frozenset(json.loads(response.data)["payload"]),
+            frozenset(("title", "comments", "comments_next_cursor")),
+        )
+
+    def test_content_comments_are_paged_by_cursor(self):
+        """Test paging the comments of a content in both orders"""
+        self.app.config["CONTENT_COMMENTS_EMBED_LIMIT"] = 2
+        with self.app.app_context():
+            comments = [
+                Comment(self.regular_user_id, self.content_id, f"Comment {i}")
+                for i in range(5)
+            ]
+            for i, comment in enumerate(comments):
+                comment.created_at = datetime(2024, 1, 1, 0, i)
+            comments[2].deleted_at = datetime.now()
+            db.session.add_all(comments)
+            db.session.commit()
+        headers = self.get_auth_headers(self.regular_user_id)
+        url = f"/contents/{self.content_id}/comments"
+
+        texts = []
+        response = self.client.get(f"{url}?order=newest&per_page=2", headers=headers)
+        while True:
+            data = json.loads(response.data)
+            texts += [comment["comment_text"] for comment in data["payload"]]
+            cursor = data["pagination"]["next_cursor"]
+            if not cursor:
+                break
+            response = self.client.get(
+                f"{url}?cursor={cursor}&per_page=2", headers=headers
+            )
+        self.assertEqual(texts, ["Comment 4", "Comment 3", "Comment 1", "Comment 0"])
+
+        response = self.client.get(f"/contents/{self.content_id}", headers=headers)
+        payload = json.loads(response.data)["payload"]
+        self.assertEqual(
+            [comment["comment_text"] for comment in payload["comments"]],
+            ["Comment 0", "Comment 1"],
+        )
+        response = self.client.get(
+            f"{url}?cursor={payload['comments_next_cursor']}", headers=headers
+        )
+        self.assertEqual(
+            [
+                comment["comment_text"]
+                for comment in json.loads(response.data)["payload"]
+            ],
+            ["Comment 3", "Comment 4"],
+        )
+        response = self.client.get("/contents", headers=headers)
+        (listed,) = [
+            content
+            for content in json.loads(response.data)["payload"]
+            if content["id"] == self.content_id
+        ]
+        self.assertEqual(listed["comments"], payload["comments"])
+        self.assertEqual(
+            listed["comments_next_cursor"], payload["comments_next_cursor"]
+        )
+        response = self.client.put(
+            f"/contents/{self.content_id}",
+            headers=self.get_auth_headers(self.admin_user_id),
+            json={"title": "Edited"},
+        )
+        edited = json.loads(response.data)["payload"]
+        self.assertEqual(edited["title"], "Edited")
+        self.assertEqual(edited["comments"], payload["comments"])
+        self.assertEqual(
+            edited["comments_next_cursor"], payload["comments_next_cursor"]
+        )
+        response = self.client.get(f"{url}?order=random", headers=headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/contents/missing/comments", headers=headers)
+        self.assertEqual(response.status_code, 404)
+
 
 if __name__ == "__main__":
     unittest.main()
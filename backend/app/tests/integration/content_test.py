@@ -2,6 +2,8 @@
 
 import unittest
 import json
+from datetime import datetime
+from sqlalchemy import event
 from uuid import uuid4
 from app.models.content import Content
 from app.extensions import DB as db
@@ -182,6 +184,197 @@ class ContentIntegrationTestCase(BaseTestCase):
             response = self.client.delete(f"/contents/{content_id}", headers=headers)
             self.assertEqual(response.status_code, 403)
 
+    def test_change_feed_pages_through_changes(self):
+        """Test that the change feed resumes from its cursor and has tombstones"""
+        self.app.config["CHANGES_FEED_SETTLE_SECONDS"] = 0
+        editor_headers = self.get_auth_headers(self.editor_user_id)
+        headers = self.get_auth_headers(self.regular_user_id)
+        ids = []
+        for i in range(3):
+            response = self.client.post(
+                "/contents",
+                headers=editor_headers,
+                json={"title": f"Content {i}", "body": f"Body {i}."},
+            )
+            ids.append(json.loads(response.data)["payload"]["id"])
+
+        response = self.client.get("/contents/changes?limit=2", headers=headers)
+        data = json.loads(response.data)
+        self.assertEqual([change["id"] for change in data["payload"]], ids[:2])
+        self.assertTrue(data["pagination"]["has_more"])
+        cursor = data["pagination"]["next_cursor"]
+
+        self.client.put(
+            f"/contents/{ids[0]}", headers=editor_headers, json={"title": "Edited"}
+        )
+        self.client.delete(f"/contents/{ids[1]}", headers=editor_headers)
+        response = self.client.get(f"/contents/changes?since={cursor}", headers=headers)
+        data = json.loads(response.data)
+        self.assertEqual(
+            [(change["op"], change["id"]) for change in data["payload"]],
+            [("create", ids[2]), ("update", ids[0]), ("delete", ids[1])],
+        )
+        self.assertFalse(data["pagination"]["has_more"])
+
+    def test_change_feed_rejects_invalid_cursor(self):
+        """Test that a malformed cursor is a bad request"""
+        headers = self.get_auth_headers(self.regular_user_id)
+        response = self.client.get("/contents/changes?since=garbage", headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_change_feed_spends_the_list_budget(self):
+        """Test that the change feed spends its limit from the list budget"""
+        self.app.config["RATELIMIT_LIST_BUDGET"] = "30 per minute"
+        headers = self.get_auth_headers(self.regular_user_id)
+        response = self.client.get("/contents/changes?limit=20", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-RateLimit-Remaining"], "10")
+
+        response = self.client.get("/contents/changes?limit=20", headers=headers)
+        self.assertEqual(response.status_code, 429)
+
+    def test_list_page_size_is_clamped_and_costed(self):
+        """Test that per_page is capped and spends a budget counted in rows"""
+        self.app.config.update(MAX_PER_PAGE=20, RATELIMIT_LIST_BUDGET="30 per minute")
+        headers = self.get_auth_headers(self.regular_user_id)
+        response = self.client.get("/contents?per_page=100000", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)["pagination"]["per_page"], 20)
+        self.assertEqual(response.headers["X-RateLimit-Limit"], "30")
+        self.assertEqual(response.headers["X-RateLimit-Remaining"], "10")
+
+        response = self.client.get("/contents?per_page=20", headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_list_pages_by_cursor(self):
+        """Test paging contents forwards and back by cursor without a count"""
+        created_at = datetime(2024, 1, 1)
+        with self.app.app_context():
+            contents = [Content(title=f"Content {i}", body="Body.") for i in range(5)]
+            for content in contents:
+                content.created_at = created_at
+            db.session.add_all(contents)
+            db.session.commit()
+            ids = sorted(content.id for content in contents)
+        headers = self.get_auth_headers(self.regular_user_id)
+
+        response = self.client.get("/contents?cursor=&per_page=2", headers=headers)
+        data = json.loads(response.data)
+        self.assertEqual([content["id"] for content in data["payload"]], ids[:2])
+        self.assertIsNone(data["pagination"]["total_items"])
+        self.assertIsNone(data["pagination"]["prev_cursor"])
+        cursor = data["pagination"]["next_cursor"]
+
+        response = self.client.get(
+            f"/contents?cursor={cursor}&per_page=2&total=exact", headers=headers
+        )
+        data = json.loads(response.data)
+        self.assertEqual([content["id"] for content in data["payload"]], ids[2:4])
+        self.assertEqual(data["pagination"]["total_items"], 5)
+        cursor = data["pagination"]["prev_cursor"]
+
+        response = self.client.get(
+            f"/contents?cursor={cursor}&per_page=2", headers=headers
+        )
+        data = json.loads(response.data)
+        self.assertEqual([content["id"] for content in data["payload"]], ids[:2])
+        self.assertIsNone(data["pagination"]["prev_cursor"])
+
+        response = self.client.get(
+            "/contents?page=3&per_page=2&total=none", headers=headers
+        )
+        data = json.loads(response.data)
+        self.assertEqual(len(data["payload"]), 1)
+        self.assertIsNone(data["pagination"]["next_page"])
+        response = self.client.get("/contents?cursor=garbage", headers=headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/contents?total=roughly", headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_summary_view_leaves_the_body_unloaded(self):
+        """Test that view=summary returns the stored excerpt without the body"""
+        body = "word " * 1000
+        with self.app.app_context():
+            content = Content(title="Long", body=body)
+            db.session.add(content)
+            db.session.commit()
+            self.assertTrue(content.excerpt.endswith("word..."))
+            self.assertLessEqual(len(content.excerpt), 200)
+            excerpt = content.excerpt
+        statements = []
+
+        def record(_conn, _cursor, statement, *_args):
+            if "FROM contents" in statement:
+                statements.append(statement)
+
+        headers = self.get_auth_headers(self.regular_user_id)
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            response = self.client.get("/contents?view=summary", headers=headers)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        payload = json.loads(response.data)["payload"]
+        self.assertEqual(
+            set(payload[0]), {"id", "title", "excerpt", "created_at", "updated_at"}
+        )
+        self.assertEqual(payload[0]["excerpt"], excerpt)
+        self.assertFalse([s for s in statements if "contents.body" in s])
+
+    def test_excerpts_command_fills_missing_excerpts(self):
+        """Test that the excerpts command backfills contents without one"""
+        with self.app.app_context():
+            content = Content(title="Old", body="An old   body.")
+            db.session.add(content)
+            db.session.commit()
+            content.excerpt = ""
+            db.session.commit()
+            content_id = content.id
+        result = self.app.test_cli_runner().invoke(args=["contents", "excerpts"])
+        self.assertIn("Stored 1 excerpts.", result.output)
+        with self.app.app_context():
+            content = db.session.get(Content, content_id)
+            self.assertEqual(content.excerpt, "An old body.")
+
+    def test_conditional_get_answers_not_modified(self):
+        """Test that validators give 304s until the content or its comments change"""
+        self.app.config["CONTENT_CACHE_CONTROL"] = "private, max-age=60"
+        headers = self.get_auth_headers(self.regular_user_id)
+        response = self.client.post(
+            "/contents",
+            headers=self.get_auth_headers(self.editor_user_id),
+            json={"title": "Cached", "body": "Cached body."},
+        )
+        url = f"/contents/{json.loads(response.data)['payload']['id']}"
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.headers["Cache-Control"], "private, max-age=60")
+        etag = response.headers["ETag"]
+
+        response = self.client.get(url, headers={**headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        response = self.client.get(
+            f"{url}?view=summary", headers={**headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.post(
+            "/comments",
+            headers=headers,
+            json={"content_id": url.split("/")[-1], "comment_text": "New."},
+        )
+        response = self.client.get(url, headers={**headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        response = self.client.get(
+            url,
+            headers={
+                **headers,
+                "If-Modified-Since": response.headers["Last-Modified"],
+            },
+        )
+        self.assertEqual(response.status_code, 304)
+
 
 if __name__ == "__main__":
     unittest.main()
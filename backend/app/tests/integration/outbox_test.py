@@ -0,0 +1,194 @@
+"""Integration tests for the content event outbox"""
+
+import json
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from pika.exceptions import AMQPConnectionError
+from app.models.outbox import OutboxEvent
+from app.extensions import DB as db
+from app.services.content_events import apply_body_delta
+from app.services.metrics import METRICS
+from app.services.outbox import OutboxRelay, replay_outbox_events
+from app.tests.integration.base_test_class import BaseTestCase
+
+
+class RecordingProducer:
+    """Producer double recording confirmed batches"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def publish_batch(self, messages):
+        """Record a batch or fail like an unreachable broker"""
+        if self.fail:
+            raise AMQPConnectionError("broker unreachable")
+        self.batches.append(list(messages))
+
+
+class OutboxIntegrationTestCase(BaseTestCase):
+    """Integration tests for the content event outbox"""
+
+    def setUp(self):
+        """Set up an editor and a relay with a recording producer"""
+        super().setUp()
+        with self.app.app_context():
+            editor_user = self.create_editor_user()
+            db.session.add(editor_user)
+            db.session.commit()
+            self.editor_user_id = editor_user.id
+        self.producer = RecordingProducer()
+        self.relay = OutboxRelay(self.producer)
+        self.relay.app = self.app
+
+    def create_content(self, title):
+        """Helper method to create content through the API"""
+        response = self.client.post(
+            "/contents",
+            headers=self.get_auth_headers(self.editor_user_id),
+            json={"title": title, "body": f"Body of {title}."},
+        )
+        return json.loads(response.data)["payload"]["id"]
+
+    def test_content_changes_are_written_to_the_outbox(self):
+        """Test that create, update and delete stage events in the outbox"""
+        headers = self.get_auth_headers(self.editor_user_id)
+        content_id = self.create_content("Outboxed")
+        self.client.put(
+            f"/contents/{content_id}", headers=headers, json={"title": "Renamed"}
+        )
+        self.client.delete(f"/contents/{content_id}", headers=headers)
+        events = OutboxEvent.query.order_by(OutboxEvent.id).all()
+        ops = [json.loads(event.payload)["op"] for event in events]
+        self.assertEqual(ops, ["create", "update", "delete"])
+        self.assertTrue(all(event.published_at is None for event in events))
+
+    def test_update_events_carry_only_the_changes(self):
+        """Test that updates send changed fields and a delta of the body"""
+        headers = self.get_auth_headers(self.editor_user_id)
+        content_id = self.create_content("Versioned")
+        body = "Rewritten from scratch. " * 20
+        self.client.put(f"/contents/{content_id}", headers=headers, json={"body": body})
+        self.client.put(
+            f"/contents/{content_id}",
+            headers=headers,
+            json={"body": body + "One more sentence."},
+        )
+        self.client.delete(f"/contents/{content_id}", headers=headers)
+        self.relay.drain()
+        events = [json.loads(message) for message in self.producer.batches[0]]
+        self.assertTrue(all(event["v"] == 1 for event in events))
+        self.assertEqual(events[1]["body"], body)
+        self.assertNotIn("title", events[1])
+        self.assertNotIn("body", events[2])
+        self.assertNotIn("previous_body", events[2])
+        self.assertEqual(
+            apply_body_delta(body, events[2]["body_delta"]),
+            body + "One more sentence.",
+        )
+        self.assertEqual(events[3], {"v": 1, "op": "delete", "id": content_id})
+
+    def test_bursts_of_saves_coalesce_into_one_delta(self):
+        """Test that small saves fold into one delta from the published body"""
+        headers = self.get_auth_headers(self.editor_user_id)
+        content_id = self.create_content("Drafted")
+        self.relay.drain()
+        published_body = "Body of Drafted."
+        body = published_body + " Long enough to be worth a delta." * 5
+        self.client.put(f"/contents/{content_id}", headers=headers, json={"body": body})
+        self.relay.drain()
+        self.app.config["OUTBOX_COALESCE_WINDOW"] = 1
+        for i in range(10):
+            self.client.put(
+                f"/contents/{content_id}",
+                headers=headers,
+                json={"body": f"{body} Edit {i}."},
+            )
+        coalesced = METRICS.snapshot().get("outbox.coalesced", 0)
+        self.assertEqual(self.relay.drain(), 10)
+        self.assertEqual(METRICS.snapshot()["outbox.coalesced"], coalesced + 9)
+        (message,) = self.producer.batches[-1]
+        event = json.loads(message)
+        self.assertEqual(apply_body_delta(body, event["body_delta"]), f"{body} Edit 9.")
+        self.assertEqual(list(event["chunks"]), ["changed"])
+
+    def test_relay_publishes_in_order_and_marks_events(self):
+        """Test that the relay drains ordered batches and marks them published"""
+        self.app.config["OUTBOX_BATCH_SIZE"] = 2
+        ids = [self.create_content(f"Content {i}") for i in range(3)]
+        self.assertEqual(self.relay.drain(), 3)
+        self.assertEqual([len(batch) for batch in self.producer.batches], [2, 1])
+        published = [
+            json.loads(message)["id"]
+            for batch in self.producer.batches
+            for message in batch
+        ]
+        self.assertEqual(published, ids)
+        self.assertEqual(
+            OutboxEvent.query.filter(OutboxEvent.published_at.is_(None)).count(), 0
+        )
+
+    def test_events_stay_pending_when_broker_is_down(self):
+        """Test that a failed batch is kept for the next attempt"""
+        self.create_content("Pending")
+        self.producer.fail = True
+        with self.assertRaises(AMQPConnectionError):
+            self.relay.drain_once()
+        self.assertEqual(
+            OutboxEvent.query.filter(OutboxEvent.published_at.is_(None)).count(), 1
+        )
+        self.producer.fail = False
+        self.assertEqual(self.relay.drain_once(), 1)
+
+    def test_only_the_elected_relay_publishes(self):
+        """Test that a relay without the relay lock leaves the outbox alone"""
+        self.create_content("Elected")
+        with mock.patch.object(self.relay, "is_leader", return_value=False):
+            self.assertEqual(self.relay.drain(), 0)
+        self.assertEqual(self.producer.batches, [])
+        self.assertEqual(self.relay.drain(), 1)
+
+    def test_replay_republishes_events(self):
+        """Test that replayed events are published again"""
+        self.create_content("Replayed")
+        self.relay.drain()
+        count = replay_outbox_events(datetime.now() - timedelta(hours=1))
+        self.assertEqual(count, 1)
+        self.relay.drain()
+        self.assertEqual(len(self.producer.batches), 2)
+
+    def test_metrics_expose_the_outbox_backlog(self):
+        """Test that the metrics endpoint reports pending and published events"""
+        with self.app.app_context():
+            admin_user = self.create_admin_user()
+            db.session.add(admin_user)
+            db.session.commit()
+            headers = self.get_auth_headers(admin_user.id)
+        self.assertEqual(
+            self.client.get(
+                "/metrics", headers=self.get_auth_headers(self.editor_user_id)
+            ).status_code,
+            403,
+        )
+        self.create_content("Pending")
+        data = json.loads(self.client.get("/metrics", headers=headers).data)["payload"]
+        self.assertEqual(data["outbox.pending"], 1)
+        published = data.get("outbox.published", 0)
+        self.relay.drain()
+        data = json.loads(self.client.get("/metrics", headers=headers).data)["payload"]
+        self.assertEqual(data["outbox.pending"], 0)
+        self.assertEqual(data["outbox.published"], published + 1)
+
+    def test_stopping_relay_drains_until_the_timeout(self):
+        """Test that a stopping relay keeps publishing only until its deadline"""
+        self.create_content("Left behind")
+        self.relay.stop(timeout=0)
+        self.assertEqual(self.relay.drain(), 0)
+        self.relay.stop(timeout=60)
+        self.assertEqual(self.relay.drain(), 1)
+        self.assertEqual(len(self.producer.batches), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+"""Integration tests for the RabbitMQ producer service"""
+
+import json
+import os
+import unittest
+from unittest import mock
+from pika.exceptions import AMQPConnectionError, NackError
+from app.services.coalescer import coalesce
+from app.services.content_events import decode_payload
+from app.services.metrics import Metrics
+from app.services.producer import Producer
+
+
+class FakeChannel:
+    """In-memory stand-in for a pika blocking channel"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.confirming = False
+
+    def confirm_delivery(self):
+        """Switch the channel to publisher-confirms mode"""
+        self.confirming = True
+        self.broker.confirm_channels += 1
+
+    def queue_declare(self, queue):
+        """Record a queue declaration"""
+        self.broker.declared.append(queue)
+
+    def basic_publish(self, exchange, routing_key, body, **kwargs):
+        """Record a published message"""
+        if self.broker.fail_publishes:
+            self.broker.fail_publishes -= 1
+            self.is_open = False
+            raise AMQPConnectionError("connection lost")
+        if self.broker.nack_publishes and self.confirming:
+            self.broker.nack_publishes -= 1
+            raise NackError([])
+        self.broker.published.append((exchange, routing_key, body))
+        self.broker.properties.append(kwargs.get("properties"))
+
+
+class FakeConnection:
+    """In-memory stand-in for a pika blocking connection"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        broker.connections.append(self)
+
+    def channel(self):
+        """Open a fake channel"""
+        return FakeChannel(self.broker)
+
+    def process_data_events(self, time_limit=None):
+        """Pretend to service heartbeats"""
+        return time_limit
+
+    def close(self):
+        """Close the fake connection"""
+        self.is_open = False
+
+
+class FakeBroker:
+    """Collects what the producer sends"""
+
+    def __init__(self):
+        self.connections = []
+        self.declared = []
+        self.published = []
+        self.properties = []
+        self.fail_publishes = 0
+        self.nack_publishes = 0
+        self.confirm_channels = 0
+        self.down = False
+
+    def connect(self, _params):
+        """Factory replacing pika.BlockingConnection"""
+        if self.down:
+            raise AMQPConnectionError("broker unreachable")
+        return FakeConnection(self)
+
+
+class ProducerTestCase(unittest.TestCase):
+    """Tests for connection reuse, confirms and retries in the producer"""
+
+    def setUp(self):
+        """Patch pika with a fake broker"""
+        self.broker = FakeBroker()
+        patcher = mock.patch(
+            "app.services.producer.pika.BlockingConnection", self.broker.connect
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.producer = self.make_producer()
+
+    def make_producer(self, **env):
+        """Create a producer with its own metrics and settings"""
+        with mock.patch.dict(os.environ, env):
+            producer = Producer(metrics=Metrics())
+        producer.retry_backoff = producer.max_retry_backoff = 0
+        return producer
+
+    def bodies(self):
+        """Return the published message bodies"""
+        return [body for _exchange, _key, body in self.broker.published]
+
+    def test_connection_is_reused_across_batches(self):
+        """Test that one connection and one queue declaration serve many batches"""
+        for i in range(10):
+            self.producer.publish_batch([f"message {i}"])
+        self.producer.close()
+        self.assertEqual(len(self.broker.published), 10)
+        self.assertEqual(len(self.broker.connections), 1)
+        self.assertEqual(len(self.broker.declared), 1)
+        self.assertEqual(self.broker.confirm_channels, 1)
+        self.assertFalse(self.broker.connections[0].is_open)
+
+    def test_reconnects_after_connection_loss(self):
+        """Test that a lost connection is replaced and the batch retried"""
+        self.broker.fail_publishes = 1
+        self.producer.publish_batch(["message"])
+        self.producer.close()
+        self.assertEqual(len(self.broker.published), 1)
+        self.assertEqual(len(self.broker.connections), 2)
+        metrics = self.producer.metrics.snapshot()
+        self.assertEqual(metrics["producer.retries"], 1)
+        self.assertEqual(metrics["producer.published"], 1)
+
+    def test_state_is_rebuilt_after_fork(self):
+        """Test that a forked child does not reuse the parent's connections"""
+        self.producer.publish_batch(["parent"])
+        parent_local = self.producer._local  # pylint: disable=protected-access
+        with mock.patch(
+            "app.services.producer.os.getpid", return_value=os.getpid() + 1
+        ):
+            self.producer.publish_batch(["child"])
+            self.assertIsNot(
+                self.producer._local, parent_local  # pylint: disable=protected-access
+            )
+            self.producer.close()
+        self.assertEqual(len(self.broker.connections), 2)
+        self.assertTrue(self.broker.connections[0].is_open)
+
+    def test_publish_batch_is_retried_as_a_unit(self):
+        """Test that a nacked message makes the whole batch publish again"""
+        self.broker.nack_publishes = 1
+        self.producer.publish_batch(["first", "second"])
+        self.producer.close()
+        self.assertEqual(self.bodies(), ["first", "second"])
+        self.assertEqual(self.broker.confirm_channels, 2)
+
+    def test_failure_is_raised_after_the_retries(self):
+        """Test that a batch failing every retry raises for the caller to keep it"""
+        self.broker.down = True
+        with self.assertRaises(AMQPConnectionError):
+            self.producer.publish_batch(["message"])
+        self.assertEqual(self.broker.published, [])
+        metrics = self.producer.metrics.snapshot()
+        self.assertEqual(metrics["producer.retries"], self.producer.max_retries)
+        self.assertEqual(metrics["producer.failures"], 1)
+
+    def test_large_messages_are_compressed(self):
+        """Test that messages over the threshold are deflated and flagged"""
+        producer = self.make_producer(RABBIT_MQ_COMPRESS_THRESHOLD="100")
+        large = event("create", "a", "x" * 500)
+        producer.publish_batch([event("create", "b", "small"), large])
+        producer.close()
+        small_properties, large_properties = self.broker.properties
+        self.assertIsNone(small_properties.content_encoding)
+        self.assertEqual(large_properties.content_type, "application/json")
+        self.assertLess(len(self.bodies()[1]), len(large))
+        self.assertEqual(
+            decode_payload(self.bodies()[1], large_properties.content_encoding),
+            json.loads(large),
+        )
+
+
+def event(op, content_id, title=None):
+    """Return a serialized content event"""
+    message = {"op": op, "id": content_id}
+    if title is not None:
+        message["title"] = title
+    return json.dumps(message, separators=(",", ":"))
+
+
+class CoalesceTestCase(unittest.TestCase):
+    """Tests for collapsing content events per content id"""
+
+    def test_create_and_updates_collapse_to_a_create_with_the_latest_state(self):
+        """Test that updates fold into the create they follow"""
+        messages, saved = coalesce(
+            [event("create", "a", "one"), event("update", "a", "two")]
+        )
+        self.assertEqual(
+            [json.loads(message) for message in messages],
+            [{"op": "create", "id": "a", "title": "two"}],
+        )
+        self.assertEqual(saved, 1)
+
+    def test_updates_keep_the_body_consumers_hold(self):
+        """Test that merged updates diff from the first replaced body"""
+        first = json.dumps(
+            {"op": "update", "id": "a", "body": "Hello there", "previous_body": "Hi"}
+        )
+        second = json.dumps(
+            {"op": "update", "id": "a", "body": "Hello world", "previous_body": "x"}
+        )
+        messages, saved = coalesce([first, event("update", "a", "t"), second])
+        self.assertEqual(
+            [json.loads(message) for message in messages],
+            [
+                {
+                    "op": "update",
+                    "id": "a",
+                    "title": "t",
+                    "body": "Hello world",
+                    "previous_body": "Hi",
+                }
+            ],
+        )
+        self.assertEqual(saved, 2)
+        published = json.dumps({"op": "update", "id": "a", "body_delta": [0, 1, "x"]})
+        self.assertEqual(coalesce([published, published]), ([published] * 2, 0))
+
+    def test_per_id_order_is_kept(self):
+        """Test that a delete after an update wins and other ids are untouched"""
+        messages, saved = coalesce(
+            [
+                event("update", "a", "one"),
+                event("update", "b", "two"),
+                event("delete", "a"),
+                "not an event",
+                event("create", "a", "again"),
+            ]
+        )
+        self.assertEqual(
+            messages,
+            [
+                event("update", "b", "two"),
+                event("delete", "a"),
+                "not an event",
+                event("create", "a", "again"),
+            ],
+        )
+        self.assertEqual(saved, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
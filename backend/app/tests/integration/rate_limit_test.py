@@ -0,0 +1,77 @@
+"""Integration tests for the shared-memory rate limit storage"""
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from app.services.rate_limit_storage import SharedMemoryStorage
+
+
+def hit_many(uri, times):
+    """Count hits from another process"""
+    storage = storage_from_string(uri)
+    for _ in range(times):
+        storage.incr("shared", 60)
+    storage.close()
+
+
+class SharedMemoryStorageTestCase(unittest.TestCase):
+    """Tests for the mmap:// rate limit storage"""
+
+    def setUp(self):
+        """Create a file for the counters"""
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+        self.uri = f"mmap://{self.path}?slots=64&stripes=4"
+
+    def open_storage(self, uri=None):
+        """Map the counters as one more worker would"""
+        storage = storage_from_string(uri or self.uri)
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_limits_are_shared_between_workers(self):
+        """Test that two mappings of the file enforce one limit"""
+        first, second = self.open_storage(), self.open_storage()
+        self.assertIsInstance(first, SharedMemoryStorage)
+        limit = parse("3 per minute")
+        limiters = [FixedWindowRateLimiter(first), FixedWindowRateLimiter(second)]
+        hits = [limiters[i % 2].hit(limit, "client") for i in range(4)]
+        self.assertEqual(hits, [True, True, True, False])
+        self.assertEqual(second.get("LIMITER/client/3/1/minute"), 4)
+
+        first.clear("LIMITER/client/3/1/minute")
+        self.assertTrue(limiters[1].hit(limit, "client"))
+        self.assertEqual(first.reset(), 1)
+        self.assertEqual(second.get("LIMITER/client/3/1/minute"), 0)
+
+    def test_counts_are_exact_across_processes(self):
+        """Test that concurrent increments from several processes add up"""
+        processes = [
+            multiprocessing.Process(target=hit_many, args=(self.uri, 250))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.open_storage().get("shared"), 1000)
+
+    def test_expired_and_evicted_slots_are_reused(self):
+        """Test that windows end and a full stripe evicts the oldest key"""
+        storage = self.open_storage(f"mmap://{self.path}?slots=16&stripes=1")
+        storage.incr("expired", 0)
+        self.assertEqual(storage.get("expired"), 0)
+        for i in range(16):
+            storage.incr(f"key-{i}", 60 + i)
+        self.assertEqual(storage.incr("one-more", 60), 1)
+        self.assertEqual(storage.get("key-0"), 0)
+        self.assertEqual(sum(storage.get(f"key-{i}") for i in range(16)), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
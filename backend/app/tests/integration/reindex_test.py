@@ -0,0 +1,120 @@
+"""Integration tests for the content reindex"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from pika.exceptions import AMQPConnectionError
+from app.extensions import DB as db
+from app.models.content import Content
+from app.services.reindex import Reindexer
+from app.tests.integration.base_test_class import BaseTestCase
+
+
+class RecordingProducer:
+    """Producer double recording confirmed batches"""
+
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+        self.lock = threading.Lock()
+
+    def publish_batch(self, messages):
+        """Record a batch or fail like an unreachable broker"""
+        with self.lock:
+            if self.fail_after is not None and len(self.batches) >= self.fail_after:
+                raise AMQPConnectionError("broker unreachable")
+            self.batches.append([json.loads(message) for message in messages])
+
+    def ids(self):
+        """Return the content ids published so far"""
+        return sorted(event["id"] for batch in self.batches for event in batch)
+
+
+class ReindexIntegrationTestCase(BaseTestCase):
+    """Integration tests for the content reindex"""
+
+    def setUp(self):
+        """Seed contents and a checkpoint location"""
+        super().setUp()
+        contents = [Content(title=f"Title {i}", body=f"Body {i}") for i in range(25)]
+        contents[0].deleted_at = datetime.now()
+        db.session.add_all(contents)
+        db.session.commit()
+        self.live_ids = sorted(content.id for content in contents[1:])
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.checkpoint = os.path.join(directory, "reindex.checkpoint")
+
+    def test_publishes_every_live_content(self):
+        """Test that all live contents are published as create events"""
+        producer = RecordingProducer()
+        reindexer = Reindexer(producer, batch_size=4, workers=3)
+        self.assertEqual(reindexer.count(), 24)
+        self.assertEqual(reindexer.run(), 24)
+        self.assertEqual(producer.ids(), self.live_ids)
+        self.assertTrue(
+            all(
+                event["op"] == "create" for batch in producer.batches for event in batch
+            )
+        )
+
+    def test_resumes_from_the_checkpoint(self):
+        """Test that a failed reindex continues where it stopped"""
+        reindexer = Reindexer(
+            RecordingProducer(fail_after=2),
+            batch_size=4,
+            workers=1,
+            checkpoint_path=self.checkpoint,
+        )
+        with self.assertRaises(AMQPConnectionError):
+            reindexer.run()
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+        producer = RecordingProducer()
+        reindexer = Reindexer(producer, batch_size=4, checkpoint_path=self.checkpoint)
+        self.assertTrue(reindexer.resume())
+        self.assertEqual(reindexer.count(), 16)
+        self.assertEqual(reindexer.run(), 24)
+        self.assertEqual(producer.ids(), self.live_ids[8:])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_updated_since_filters_contents(self):
+        """Test that only recently updated contents are published"""
+        recent = Content.query.filter(Content.deleted_at.is_(None)).first()
+        Content.query.filter(Content.id != recent.id).update(
+            {Content.updated_at: datetime.now() - timedelta(days=2)}
+        )
+        db.session.commit()
+        producer = RecordingProducer()
+        reindexer = Reindexer(
+            producer, updated_since=datetime.now() - timedelta(days=1)
+        )
+        self.assertEqual(reindexer.run(), 1)
+        self.assertEqual(producer.ids(), [recent.id])
+
+    def test_cli_command_reports_progress(self):
+        """Test the reindex command end to end"""
+        producer = RecordingProducer()
+        with mock.patch("app.commands.content_commands.PRODUCER", producer):
+            result = self.app.test_cli_runner().invoke(
+                args=[
+                    "contents",
+                    "reindex",
+                    "--batch-size",
+                    "10",
+                    "--checkpoint",
+                    self.checkpoint,
+                ]
+            )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Published 24 events.", result.output)
+        self.assertEqual(producer.ids(), self.live_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Integration tests for upgrading the schema of an existing database"""
+
+import json
+import unittest
+from datetime import datetime
+from sqlalchemy import inspect, text
+from app.extensions import DB as db
+from app.services.schema import ADDED_INDEXES, pending_schema_changes
+from app.tests.integration.base_test_class import BaseTestCase
+
+
+class SchemaUpgradeTestCase(BaseTestCase):
+    """Integration tests for ``flask schema upgrade``"""
+
+    def upgrade(self, *args):
+        """Run the upgrade command and return its output"""
+        result = self.app.test_cli_runner().invoke(args=["schema", "upgrade", *args])
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result.output
+
+    def test_upgrade_adds_what_earlier_versions_lack(self):
+        """Test that a database of an earlier version is brought up to date"""
+        admin_user = self.create_admin_user()
+        db.session.add(admin_user)
+        db.session.commit()
+        admin_user_id = admin_user.id
+        with db.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE users DROP COLUMN token_version"))
+            connection.execute(text("ALTER TABLE contents DROP COLUMN excerpt"))
+            for table, name in ADDED_INDEXES:
+                connection.execute(text(f"DROP INDEX {name}"))
+            connection.execute(
+                text(
+                    "INSERT INTO contents (id, title, body, created_at, updated_at)"
+                    " VALUES ('old', 'Old', 'Stored before excerpts.', :now, :now)"
+                ),
+                {"now": datetime.now()},
+            )
+        db.session.remove()
+
+        self.assertIn("ADD COLUMN token_version", self.upgrade("--dry-run"))
+        self.assertEqual(len(pending_schema_changes()), 2 + len(ADDED_INDEXES))
+        output = self.upgrade()
+        self.assertIn("ADD COLUMN token_version", output)
+        self.assertIn("ADD COLUMN excerpt", output)
+        for table, name in ADDED_INDEXES:
+            self.assertIn(
+                name,
+                {index["name"] for index in inspect(db.engine).get_indexes(table.name)},
+            )
+        self.assertEqual(pending_schema_changes(), [])
+        self.assertIn("up to date", self.upgrade())
+
+        response = self.client.get(
+            f"/users/{admin_user_id}", headers=self.get_auth_headers(admin_user_id)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)["payload"]["id"], admin_user_id)
+        response = self.client.get(
+            "/contents/old", headers=self.get_auth_headers(admin_user_id)
+        )
+        self.assertEqual(json.loads(response.data)["payload"]["excerpt"], "")
+        result = self.app.test_cli_runner().invoke(args=["contents", "excerpts"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        response = self.client.get(
+            "/contents/old", headers=self.get_auth_headers(admin_user_id)
+        )
+        self.assertEqual(
+            json.loads(response.data)["payload"]["excerpt"], "Stored before excerpts."
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,14 @@
 """Integration tests for user related endpoints"""
 
 import json
+import threading
+import time
 import unittest
+from unittest import mock
+from datetime import datetime
 from app.extensions import DB as db
+from app.models.user import User
+from app.services.passwords import PASSWORDS, PasswordServiceBusy, hash_rounds
 from app.tests.integration.base_test_class import BaseTestCase
 
 
@@ -68,6 +74,7 @@ class UserIntegrationTestCase(BaseTestCase):
 
     def test_create_user_as_admin(self):
         """Test creating a new user as an admin"""
+        started = datetime.now().replace(microsecond=0)
         with self.client:
             headers = self.get_auth_headers(self.admin_user_id)
             response = self.client.post(
@@ -85,6 +92,10 @@ class UserIntegrationTestCase(BaseTestCase):
             self.assertEqual(response.status_code, 201)
             data = json.loads(response.data)
             self.assertIn("User created successfully", data["message"])
+        with self.app.app_context():
+            user = User.query.filter_by(username="newuser").first()
+            self.assertGreaterEqual(user.created_at, started)
+            self.assertGreaterEqual(user.updated_at, started)
 
     def test_create_user_as_regular_user(self):
         """Test creating a new user as a regular user (should fail)"""
@@ -113,6 +124,19 @@ class UserIntegrationTestCase(BaseTestCase):
             self.assertEqual(response.status_code, 200)
             data = json.loads(response.data)
             self.assertIn("User retrieved successfully", data["message"])
+            self.assertNotIn("password_hash", data["payload"])
+            self.assertNotIn("token_version", data["payload"])
+
+    def test_get_user_by_id_is_conditional(self):
+        """Test that an unchanged user is answered with a 304"""
+        headers = self.get_auth_headers(self.admin_user_id)
+        response = self.client.get(f"/users/{self.admin_user_id}", headers=headers)
+        self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+        response = self.client.get(
+            f"/users/{self.admin_user_id}",
+            headers={**headers, "If-None-Match": response.headers["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
 
     def test_delete_user_as_admin(self):
         """Test deleting a user as an admin"""
@@ -167,6 +191,209 @@ class UserIntegrationTestCase(BaseTestCase):
             self.assertIn("User role updated successfully", data["message"])
             self.assertEqual(data["payload"]["role"], "editor")
 
+    def use_password_settings(self, **settings):
+        """Apply password settings until the end of the test"""
+        defaults = {key: self.app.config[key] for key in settings}
+        self.app.config.update(settings)
+        PASSWORDS.init_app(self.app)
+        self.addCleanup(PASSWORDS.init_app, self.app)
+        self.addCleanup(self.app.config.update, defaults)
+
+    def test_login_rehashes_password_when_cost_changes(self):
+        """Test that logging in upgrades a hash made with another cost"""
+        self.use_password_settings(BCRYPT_LOG_ROUNDS=4)
+        self.register_test_user()
+        user = User.query.filter_by(username="testuser").first()
+        self.assertEqual(hash_rounds(user.password_hash), 4)
+
+        self.use_password_settings(BCRYPT_LOG_ROUNDS=5)
+        response = self.client.post(
+            "/login", json={"username": "testuser", "password": "testpass"}
+        )
+        self.assertEqual(response.status_code, 200)
+        db.session.expire_all()
+        user = User.query.filter_by(username="testuser").first()
+        self.assertEqual(hash_rounds(user.password_hash), 5)
+        response = self.client.post(
+            "/login", json={"username": "testuser", "password": "testpass"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_is_rejected_when_password_workers_are_busy(self):
+        """Test that logins get a 503 instead of waiting for a busy pool"""
+        self.use_password_settings(PASSWORD_WORKERS=1, BCRYPT_LOG_ROUNDS=4)
+        self.register_test_user()
+        self.use_password_settings(
+            PASSWORD_WORKERS=1, BCRYPT_LOG_ROUNDS=4, PASSWORD_QUEUE_TIMEOUT=0.05
+        )
+        PASSWORDS.rounds = 15
+        busy = threading.Thread(target=PASSWORDS.hash, args=("slow",))
+        busy.start()
+        time.sleep(0.2)
+        response = self.client.post(
+            "/login", json={"username": "testuser", "password": "testpass"}
+        )
+        busy.join()
+        self.assertEqual(response.status_code, 503)
+
+    def test_login_succeeds_when_the_rehash_finds_workers_busy(self):
+        """Test that a busy pool only postpones the rehash of a verified password"""
+        self.use_password_settings(BCRYPT_LOG_ROUNDS=4)
+        self.register_test_user()
+        self.use_password_settings(BCRYPT_LOG_ROUNDS=5)
+        with mock.patch.object(
+            PASSWORDS, "hash", side_effect=PasswordServiceBusy("busy")
+        ):
+            response = self.client.post(
+                "/login", json={"username": "testuser", "password": "testpass"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access_token", json.loads(response.data)["payload"])
+        db.session.expire_all()
+        user = User.query.filter_by(username="testuser").first()
+        self.assertEqual(hash_rounds(user.password_hash), 4)
+
+    def refresh(self, refresh_token, path="/token/refresh"):
+        """Post a refresh token to a token endpoint"""
+        return self.client.post(
+            path, headers={"Authorization": f"Bearer {refresh_token}"}
+        )
+
+    def test_refresh_token_rotation(self):
+        """Test that refresh tokens rotate and that reusing one revokes them"""
+        self.login_test_user()
+        response = self.client.post(
+            "/login", json={"username": "testuser", "password": "testpass"}
+        )
+        first = json.loads(response.data)["payload"]["refresh_token"]
+
+        response = self.refresh(first)
+        self.assertEqual(response.status_code, 200)
+        tokens = json.loads(response.data)["payload"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        self.assertEqual(self.client.get("/contents", headers=headers).status_code, 200)
+        second = tokens["refresh_token"]
+        response = self.refresh(second)
+        self.assertEqual(response.status_code, 200)
+        third = json.loads(response.data)["payload"]["refresh_token"]
+
+        # Replaying a used token revokes every token of its family.
+        self.assertEqual(self.refresh(second).status_code, 401)
+        self.assertEqual(self.refresh(third).status_code, 401)
+
+    def test_revoked_refresh_token_is_rejected(self):
+        """Test that a revoked refresh token can no longer be used"""
+        self.register_test_user()
+        response = self.client.post(
+            "/login", json={"username": "testuser", "password": "testpass"}
+        )
+        refresh_token = json.loads(response.data)["payload"]["refresh_token"]
+        response = self.refresh(refresh_token, "/token/revoke")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+    def test_bulk_user_provisioning(self):
+        """Test provisioning users from CSV and NDJSON uploads"""
+        self.use_password_settings(BCRYPT_LOG_ROUNDS=4)
+        self.app.config["BULK_USERS_BATCH_SIZE"] = 2
+        self.addCleanup(self.app.config.update, BULK_USERS_BATCH_SIZE=500)
+        self.register_test_user()
+        headers = self.get_auth_headers(self.admin_user_id)
+        upload = (
+            "username,password,first_name,last_name,email,role\n"
+            "alice,pass,Alice,A,alice@example.com,editor\n"
+            "bob,pass,Bob,B,bob@example.com,\n"
+            "alice,pass,Alice,A,alice2@example.com,\n"
+            "testuser,pass,Test,User,test2@example.com,\n"
+            "carol,,Carol,C,carol@example.com,\n"
+            "dave,pass,Dave,D,dave@example.com,\n"
+        )
+        response = self.client.post(
+            "/users/bulk", headers=headers, data=upload, content_type="text/csv"
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)["payload"]
+        self.assertEqual((data["created"], data["failed"]), (3, 3))
+        self.assertEqual(
+            [(r["row"], r["status"]) for r in data["results"]],
+            [
+                (1, "created"),
+                (2, "created"),
+                (3, "error"),
+                (4, "error"),
+                (5, "error"),
+                (6, "created"),
+            ],
+        )
+        self.assertEqual(User.query.filter_by(username="alice").one().role, "editor")
+        response = self.client.post(
+            "/login", json={"username": "dave", "password": "pass"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        upload = '{"username": "erin", "password": "p", "first_name": "E", '
+        upload += '"last_name": "E", "email": "erin@example.com"}\nnot json\n'
+        response = self.client.post(
+            "/users/bulk",
+            headers=headers,
+            data=upload,
+            content_type="application/x-ndjson",
+        )
+        data = json.loads(response.data)["payload"]
+        self.assertEqual([r["status"] for r in data["results"]], ["created", "error"])
+        response = self.client.post(
+            "/users/bulk", headers=headers, data="[]", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 415)
+
+    def test_search_users_by_prefix_with_keyset_paging(self):
+        """Test prefix search, filters and cursor pages over users"""
+        users = []
+        for username, last_name, role in [
+            ("alice", "Smith", "editor"),
+            ("alicia", "Jones", "regular"),
+            ("bob", "Alison", "regular"),
+            ("carol", "Brown", "regular"),
+            ("alina", "Alibi", "regular"),
+            ("alien", "Gone", "regular"),
+        ]:
+            user = self.create_regular_user()
+            user.username, user.last_name, user.role = username, last_name, role
+            users.append(user)
+        users[3].email = "ali.carol@example.com"
+        users[-1].deleted_at = datetime.now()
+        db.session.add_all(users)
+        db.session.commit()
+        headers = self.get_auth_headers(self.admin_user_id)
+
+        def search(query):
+            response = self.client.get(f"/users?{query}", headers=headers)
+            return response.status_code, json.loads(response.data)
+
+        _, data = search("q=ali")
+        self.assertEqual(
+            [user["username"] for user in data["payload"]],
+            ["alice", "alicia", "alina", "carol", "bob"],
+        )
+        _, data = search("q=ali&role=editor")
+        self.assertEqual([user["username"] for user in data["payload"]], ["alice"])
+        _, data = search("q=a%25")
+        self.assertEqual(data["payload"], [])
+
+        found, cursor = [], None
+        while True:
+            _, data = search(
+                "q=ali&per_page=1" + (f"&cursor={cursor}" if cursor else "")
+            )
+            found.extend(user["username"] for user in data["payload"])
+            cursor = data["pagination"]["next_cursor"]
+            if not data["pagination"]["has_more"]:
+                break
+        self.assertEqual(found, ["alice", "alicia", "alina", "carol", "bob"])
+
+        self.assertEqual(search("role=owner")[0], 400)
+        self.assertEqual(search("cursor=garbage")[0], 400)
+
 
 if __name__ == "__main__":
     unittest.main()
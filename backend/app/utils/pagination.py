@@ -1,8 +1,37 @@
 """Utility functions for pagination."""
 
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import func, text
+
+from app.extensions import DB as db
+
+TOTAL_MODES = ("exact", "estimate", "none")
+
+
+def get_per_page(default=15):
+    """Utility function to read ``per_page``, clamped to ``MAX_PER_PAGE``."""
+    per_page = request.args.get("per_page", default, type=int)
+    return min(max(per_page, 1), current_app.config["MAX_PER_PAGE"])
+
 
 def get_pagination_info(pagination_object):
-    """Utility function to extract pagination information."""
+    """Utility function to extract pagination information.
+
+    Without a total, there is a next page whenever this one is full.
+    """
+    if pagination_object.total is None:
+        full = len(pagination_object.items) == pagination_object.per_page
+        return {
+            "total_items": None,
+            "total_pages": None,
+            "current_page": pagination_object.page,
+            "next_page": pagination_object.page + 1 if full else None,
+            "prev_page": pagination_object.prev_num,
+            "per_page": pagination_object.per_page,
+        }
     return {
         "total_items": pagination_object.total,
         "total_pages": pagination_object.pages,
@@ -11,3 +40,77 @@ def get_pagination_info(pagination_object):
         "prev_page": pagination_object.prev_num,
         "per_page": pagination_object.per_page,
     }
+
+
+def encode_cursor(*values):
+    """Utility function to turn keyset values into an opaque cursor."""
+    raw = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """Utility function to read the keyset values of a cursor.
+
+    ``types`` gives the type of each value; raises ValueError when the
+    cursor was not produced by ``encode_cursor`` with as many values.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except ValueError as error:
+        raise ValueError("Invalid cursor") from error
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    try:
+        return [
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for value, kind in zip(values, types)
+        ]
+    except (TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
+
+
+def keyset_after(column, tiebreaker, value, tie, descending=False):
+    """Utility function to filter on rows after a keyset position.
+
+    Rows come after ``(value, tie)`` in ``(column, tiebreaker)`` order, or
+    before it with ``descending``. The comparison is spelled out rather than
+    written on row values, so that the bound on ``column`` is an index range
+    on every database.
+    """
+    if descending:
+        return db.and_(column <= value, db.or_(column < value, tiebreaker < tie))
+    return db.and_(column >= value, db.or_(column > value, tiebreaker > tie))
+
+
+def get_cursor_pagination_info(next_cursor, has_more, limit, **extra):
+    """Utility function to describe a page of keyset pagination."""
+    return {"next_cursor": next_cursor, "has_more": has_more, "limit": limit, **extra}
+
+
+def count_items(query, table_name, mode):
+    """Utility function to count the items of a list as ``mode`` asks.
+
+    ``exact`` runs a COUNT, ``none`` skips it and returns None, and
+    ``estimate`` reads the row count kept in the table statistics of MySQL,
+    which also counts soft-deleted rows; other databases count exactly.
+    """
+    if mode == "none":
+        return None
+    if mode == "estimate" and db.engine.dialect.name == "mysql":
+        estimate = db.session.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+            ),
+            {"table": table_name},
+        ).scalar()
+        if estimate is not None:
+            return int(estimate)
+    return query.order_by(None).with_entities(func.count()).scalar()
@@ -0,0 +1,106 @@
+"""Benchmark provisioning users in bulk against creating them one by one.
+
+Uploads ``--users`` generated users to ``POST /users/bulk`` as CSV, then
+creates ``--sample`` users through ``POST /users`` and extrapolates how long
+creating every user that way would take. Both use a temporary SQLite
+database and the configured bcrypt cost unless ``--rounds`` is given.
+
+Usage::
+
+    python -m benchmarks.bulk_users --users 10000 --rounds 12
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("RABBIT_MQ_QUEUE", "benchmark")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-long-enough-for-hs256")
+
+# pylint: disable=wrong-import-position
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.extensions import DB as db
+from app.services.limiter import LIMITER
+from app.services.passwords import PASSWORDS
+from app.utils.user_factory import create_user_instance
+
+
+def user_row(prefix, number):
+    """Return the fields of a generated user."""
+    return {
+        "username": f"{prefix}{number}",
+        "password": f"password-{number}",
+        "first_name": "Bulk",
+        "last_name": f"User {number}",
+        "email": f"{prefix}{number}@example.com",
+    }
+
+
+def bulk_upload(client, headers, users):
+    """Upload generated users as CSV; return the users created and seconds."""
+    fields = list(user_row("bulk", 0))
+    lines = [",".join(fields)] + [
+        ",".join(user_row("bulk", i).values()) for i in range(users)
+    ]
+    started = time.perf_counter()
+    response = client.post(
+        "/users/bulk",
+        headers=headers,
+        data="\n".join(lines) + "\n",
+        content_type="text/csv",
+    )
+    return response.get_json()["payload"]["created"], time.perf_counter() - started
+
+
+def single_creates(client, headers, sample, users):
+    """Create a sample one by one; return the seconds extrapolated to all."""
+    started = time.perf_counter()
+    for i in range(sample):
+        client.post("/users", headers=headers, json=user_row("single", i))
+    return (time.perf_counter() - started) / sample * users
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=100)
+    parser.add_argument("--rounds", type=int)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app()
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite:///" + db_path, OUTBOX_RELAY_ENABLED=False
+    )
+    if args.rounds:
+        app.config["BCRYPT_LOG_ROUNDS"] = args.rounds
+    PASSWORDS.init_app(app)
+    LIMITER.enabled = False
+    client = app.test_client()
+    try:
+        with app.app_context():
+            db.create_all()
+            admin = create_user_instance(
+                {**user_row("admin", 0), "role": "admin"},
+            )
+            db.session.add(admin)
+            db.session.commit()
+            headers = {"Authorization": f"Bearer {create_access_token(admin.id)}"}
+
+        created, bulk = bulk_upload(client, headers, args.users)
+        single = single_creates(client, headers, args.sample, args.users)
+    finally:
+        PASSWORDS.shutdown()
+        os.close(db_fd)
+        os.unlink(db_path)
+    print(f"bulk upload:        {created} users in {bulk:10.1f} s")
+    print(f"one request each:   {args.users} users in {single:10.1f} s (extrapolated)")
+    print(f"speed-up:           {single / bulk:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
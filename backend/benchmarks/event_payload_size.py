@@ -0,0 +1,120 @@
+"""Benchmark the size of content event payloads on a seeded corpus.
+
+Every document of the corpus is created, edited a few times (title fixes,
+small body edits and rewrites of a paragraph) and deleted. The bytes of the
+former full-state JSON events are compared with the versioned envelope, with
+and without compression of large payloads.
+
+Usage::
+
+    python -m benchmarks.event_payload_size --documents 500 --seed 1
+"""
+
+import argparse
+import json
+import random
+import zlib
+from types import SimpleNamespace
+
+from app.services.content_events import (
+    create_event,
+    delete_event,
+    publishable_message,
+    update_event,
+)
+
+WORDS = (
+    "climate research unit temperature record station anomaly dataset grid "
+    "monthly series homogenised observation ocean land surface warming trend "
+    "baseline period uncertainty coverage interpolation archive model"
+).split()
+
+
+def sentence(rng):
+    """Return a random sentence."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng):
+    """Return a random paragraph."""
+    return " ".join(sentence(rng) for _ in range(rng.randint(3, 6)))
+
+
+def edit(rng, title, body):
+    """Return the title and body after a typical edit."""
+    kind = rng.random()
+    if kind < 0.3:
+        return f"{title} ({rng.randint(2, 9)})", body
+    paragraphs = body.split("\n\n")
+    index = rng.randrange(len(paragraphs))
+    if kind < 0.8:
+        paragraphs[index] += " " + sentence(rng)
+    else:
+        paragraphs[index] = paragraph(rng)
+    return title, "\n\n".join(paragraphs)[:5000]
+
+
+def legacy_events(content_id, revisions):
+    """Yield the payloads of the former full-state events."""
+    title, body = revisions[0]
+    yield json.dumps({"op": "create", "id": content_id, "title": title, "body": body})
+    for title, body in revisions[1:]:
+        yield json.dumps(
+            {"op": "update", "id": content_id, "title": title, "body": body}
+        )
+    yield json.dumps({"op": "delete", "id": content_id, "title": None, "content": None})
+
+
+def envelope_events(content_id, revisions):
+    """Yield the published payloads of the versioned envelope."""
+    content = SimpleNamespace(id=content_id, title=None, body=None)
+    content.title, content.body = revisions[0]
+    yield publishable_message(create_event(content))
+    for title, body in revisions[1:]:
+        previous_title, previous_body = content.title, content.body
+        content.title, content.body = title, body
+        yield publishable_message(update_event(content, previous_title, previous_body))
+    yield delete_event(content_id)
+
+
+def wire_size(payload, threshold):
+    """Return the bytes sent for a payload, compressing it over ``threshold``."""
+    data = payload.encode("utf-8")
+    return len(zlib.compress(data)) if len(data) > threshold else len(data)
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--edits", type=int, default=8)
+    parser.add_argument("--threshold", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    legacy = envelope = compressed = events = 0
+    for number in range(args.documents):
+        title = sentence(rng)[:60]
+        body = "\n\n".join(paragraph(rng) for _ in range(rng.randint(2, 6)))[:5000]
+        revisions = [(title, body)]
+        for _ in range(args.edits):
+            revisions.append(edit(rng, *revisions[-1]))
+        content_id = f"{number:08d}-0000-4000-8000-000000000000"
+        for payload in legacy_events(content_id, revisions):
+            legacy += len(payload.encode("utf-8"))
+            events += 1
+        for payload in envelope_events(content_id, revisions):
+            envelope += len(payload.encode("utf-8"))
+            compressed += wire_size(payload, args.threshold)
+
+    print(f"events:                   {events:12d}")
+    print(f"full-state JSON:          {legacy:12d} bytes")
+    print(f"versioned envelope:       {envelope:12d} bytes")
+    print(f"envelope and compression: {compressed:12d} bytes")
+    print(f"saving:                   {1 - compressed / legacy:12.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Benchmark logins and the latency of other endpoints during a login storm.
+
+A fixed set of request threads, like the threads of a server worker, serves
+a burst of logins while a probe keeps requesting ``GET /metrics``. Logins
+are served once with bcrypt running in the request threads and once with
+the password worker pool, reporting the login throughput, the logins shed
+with a ``503`` and the latency of the probe.
+
+Usage::
+
+    python -m benchmarks.login_storm --logins 200 --threads 16
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest import mock
+
+os.environ.setdefault("RABBIT_MQ_QUEUE", "benchmark")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-long-enough-for-hs256")
+
+# pylint: disable=wrong-import-position
+from app import create_app
+from app.extensions import DB as db
+from app.services.limiter import LIMITER
+from app.services.passwords import PASSWORDS, PasswordHasher
+from app.utils.user_factory import create_user_instance
+
+
+def run_inline(_hasher, function, *args):
+    """Run a password operation in the request thread, as before the pool."""
+    return function(*args)
+
+
+def percentile(values, fraction):
+    """Return a percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+@contextmanager
+def probing(server, client, probe_interval):
+    """Keep requesting ``GET /metrics`` through the server threads.
+
+    Yields the list the latencies of the probes are appended to.
+    """
+    probes = []
+    done = threading.Event()
+
+    def probe(enqueued):
+        client.get("/metrics")
+        probes.append(time.perf_counter() - enqueued)
+
+    def probe_loop():
+        while not done.is_set():
+            server.submit(probe, time.perf_counter())
+            time.sleep(probe_interval)
+
+    prober = threading.Thread(target=probe_loop)
+    prober.start()
+    try:
+        yield probes
+    finally:
+        done.set()
+        prober.join()
+
+
+def storm(app, logins, threads, probe_interval):
+    """Serve a login storm and return the results."""
+    client = app.test_client()
+    credentials = {"username": "storm", "password": "storm-password"}
+    statuses = []
+
+    def login():
+        statuses.append(client.post("/login", json=credentials).status_code)
+
+    with ThreadPoolExecutor(max_workers=threads) as server:
+        with probing(server, client, probe_interval) as probes:
+            started = time.perf_counter()
+            for future in [server.submit(login) for _ in range(logins)]:
+                future.result()
+            elapsed = time.perf_counter() - started
+    succeeded = statuses.count(200)
+    return {
+        "throughput": succeeded / elapsed,
+        "shed": statuses.count(503),
+        "p50": statistics.median(probes) * 1000,
+        "p99": percentile(probes, 0.99) * 1000,
+    }
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--probe-ms", type=float, default=10.0)
+    parser.add_argument("--queue-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app()
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite:///" + db_path,
+        OUTBOX_RELAY_ENABLED=False,
+        BCRYPT_LOG_ROUNDS=args.rounds,
+        PASSWORD_QUEUE_TIMEOUT=args.queue_timeout,
+    )
+    PASSWORDS.init_app(app)
+    LIMITER.enabled = False
+    with app.app_context():
+        db.create_all()
+        db.session.add(
+            create_user_instance(
+                {
+                    "username": "storm",
+                    "password": "storm-password",
+                    "first_name": "Storm",
+                    "last_name": "User",
+                    "email": "storm@example.com",
+                }
+            )
+        )
+        db.session.commit()
+
+    try:
+        with mock.patch.object(PasswordHasher, "_run", run_inline):
+            inline = storm(app, args.logins, args.threads, args.probe_ms / 1000)
+        pooled = storm(app, args.logins, args.threads, args.probe_ms / 1000)
+    finally:
+        PASSWORDS.shutdown()
+        os.close(db_fd)
+        os.unlink(db_path)
+    for name, result in (("request threads", inline), ("worker pool", pooled)):
+        print(
+            f"{name:16} {result['throughput']:8.1f} logins/s"
+            f"  shed {result['shed']:4d}"
+            f"  probe p50 {result['p50']:8.1f} ms  p99 {result['p99']:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark producer throughput against a local fake broker.
+
+The fake broker charges a fixed latency for opening a connection (TCP and
+AMQP handshake) and a much smaller one per publish, which is enough to
+compare the former connection-per-message producer with the current one.
+
+Usage::
+
+    python -m benchmarks.producer_throughput --messages 2000
+"""
+
+import argparse
+import os
+import time
+from unittest import mock
+
+import pika
+
+os.environ.setdefault("RABBIT_MQ_QUEUE", "benchmark")
+
+# pylint: disable=wrong-import-position
+from app.services.producer import Producer
+
+
+class FakeChannel:
+    """Channel whose operations cost a configurable latency."""
+
+    def __init__(self, publish_latency):
+        self.publish_latency = publish_latency
+        self.is_open = True
+
+    def confirm_delivery(self):
+        """Switch to publisher-confirms mode (one round trip)."""
+        time.sleep(self.publish_latency)
+
+    def queue_declare(self, queue):
+        """Declare a queue (one round trip)."""
+        time.sleep(self.publish_latency)
+        return queue
+
+    def basic_publish(self, **_kwargs):
+        """Publish a message."""
+        time.sleep(self.publish_latency)
+
+
+class FakeConnection:
+    """Connection whose creation costs a handshake latency."""
+
+    def __init__(self, handshake_latency, publish_latency):
+        time.sleep(handshake_latency)
+        self.publish_latency = publish_latency
+        self.is_open = True
+
+    def channel(self):
+        """Open a channel."""
+        return FakeChannel(self.publish_latency)
+
+    def process_data_events(self, time_limit=None):
+        """Service heartbeats."""
+        return time_limit
+
+    def close(self):
+        """Close the connection."""
+        self.is_open = False
+
+
+class ConnectionPerMessageProducer(Producer):
+    """The original producer: one connection per message."""
+
+    def publish_batch(self, messages):
+        for message in messages:
+            connection = pika.BlockingConnection(self.connection_params)
+            channel = connection.channel()
+            channel.queue_declare(queue=self.queue_name)
+            channel.basic_publish(
+                exchange="", routing_key=self.queue_name, body=message
+            )
+            connection.close()
+
+
+def run(producer_class, messages, batch_size, handshake_latency, publish_latency):
+    """Publish ``messages`` messages and return the throughput in msg/s.
+
+    Messages are handed over ``batch_size`` at a time, as the outbox relay does.
+    """
+
+    def connect(_params):
+        return FakeConnection(handshake_latency, publish_latency)
+
+    with mock.patch("pika.BlockingConnection", connect):
+        producer = producer_class()
+        started = time.perf_counter()
+        for first in range(0, messages, batch_size):
+            last = min(messages, first + batch_size)
+            producer.publish_batch(
+                [f'{{"op": "update", "id": "{i}"}}' for i in range(first, last)]
+            )
+        producer.close()
+        elapsed = time.perf_counter() - started
+    return messages / elapsed
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--handshake-ms", type=float, default=5.0)
+    parser.add_argument("--publish-ms", type=float, default=0.05)
+    args = parser.parse_args()
+    handshake, publish = args.handshake_ms / 1000, args.publish_ms / 1000
+
+    before = run(
+        ConnectionPerMessageProducer, args.messages, args.batch_size, handshake, publish
+    )
+    after = run(Producer, args.messages, args.batch_size, handshake, publish)
+    print(f"connection per message: {before:10.1f} msg/s")
+    print(f"persistent connection:  {after:10.1f} msg/s")
+    print(f"speed-up:               {after / before:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
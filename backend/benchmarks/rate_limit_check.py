@@ -0,0 +1,82 @@
+"""Benchmark the cost of a rate limit check for each storage.
+
+Times ``FixedWindowRateLimiter.hit`` against the per-process memory storage
+and the shared ``mmap://`` storage, first from one process and then from
+several processes hitting the same file at once.
+
+Usage::
+
+    python -m benchmarks.rate_limit_check --checks 100000 --processes 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+# pylint: disable=wrong-import-position,unused-import
+from app.services import rate_limit_storage
+
+LIMIT = parse("1000000 per minute")
+
+
+def run(uri, checks, keys):
+    """Run ``checks`` limit checks and return the cost of one in microseconds."""
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(LIMIT, f"client-{i % keys}")
+    return (time.perf_counter() - started) / checks * 1e6
+
+
+def run_in_process(uri, checks, keys, results):
+    """Run the checks in a child process and report their cost."""
+    results.put(run(uri, checks, keys))
+
+
+def run_concurrently(uri, checks, keys, processes):
+    """Run the checks in several processes and return the mean cost."""
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=run_in_process, args=(uri, checks, keys, results)
+        )
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    costs = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return sum(costs) / len(costs)
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    shared = f"mmap://{path}"
+    try:
+        memory = run("memory://", args.checks, args.keys)
+        mapped = run(shared, args.checks, args.keys)
+        contended = run_concurrently(shared, args.checks, args.keys, args.processes)
+    finally:
+        os.unlink(path)
+    print(f"memory://, 1 process:          {memory:8.2f} us/check")
+    print(f"mmap://, 1 process:            {mapped:8.2f} us/check")
+    print(f"mmap://, {args.processes} processes:          {contended:8.2f} us/check")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,5 +14,45 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS")
+    # Let Flask, not flask-restful, handle errors so that the JWT error
+    # handlers answer token and user lookup failures with a 401.
+    PROPAGATE_EXCEPTIONS = True
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(
+        days=float(os.getenv("JWT_REFRESH_TOKEN_DAYS") or "30")
+    )
+    JWT_ROLE_CLAIMS = (os.getenv("JWT_ROLE_CLAIMS") or "false").lower() == "true"
+    JWT_REVOCATION_SYNC_INTERVAL = float(
+        os.getenv("JWT_REVOCATION_SYNC_INTERVAL") or "1"
+    )
+    JWT_REVOCATION_SYNC_OVERLAP = float(
+        os.getenv("JWT_REVOCATION_SYNC_OVERLAP") or "10"
+    )
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS") or "12")
+    PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS") or "0")
+    PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT") or "1")
+    BULK_USERS_BATCH_SIZE = int(os.getenv("BULK_USERS_BATCH_SIZE") or "500")
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI") or "memory://"
+    RATELIMIT_HEADERS_ENABLED = True
+    RATELIMIT_LIST_BUDGET = os.getenv("RATELIMIT_LIST_BUDGET") or "3000 per minute"
+    RATELIMIT_READ_BUDGET = os.getenv("RATELIMIT_READ_BUDGET") or "300 per minute"
+    MAX_PER_PAGE = int(os.getenv("MAX_PER_PAGE") or "100")
+    CONTENT_CACHE_CONTROL = os.getenv("CONTENT_CACHE_CONTROL") or "private, no-cache"
+    USER_CACHE_CONTROL = os.getenv("USER_CACHE_CONTROL") or "private, no-cache"
+    CONTENT_COMMENTS_EMBED_LIMIT = int(
+        os.getenv("CONTENT_COMMENTS_EMBED_LIMIT") or "20"
+    )
+    OUTBOX_RELAY_ENABLED = (
+        os.getenv("OUTBOX_RELAY_ENABLED") or "false"
+    ).lower() == "true"
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE") or "100")
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL") or "5")
+    OUTBOX_DRAIN_TIMEOUT = float(os.getenv("OUTBOX_DRAIN_TIMEOUT") or "10")
+    OUTBOX_COALESCE_WINDOW = float(os.getenv("OUTBOX_COALESCE_WINDOW") or "0")
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE") or "10000")
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL") or "30")
+    AUTH_CACHE_BACKEND = os.getenv("AUTH_CACHE_BACKEND") or "memory"
+    AUTH_CACHE_SYNC_INTERVAL = float(os.getenv("AUTH_CACHE_SYNC_INTERVAL") or "1")
+    AUTH_CACHE_SYNC_OVERLAP = float(os.getenv("AUTH_CACHE_SYNC_OVERLAP") or "10")
+    CHANGES_FEED_SETTLE_SECONDS = float(os.getenv("CHANGES_FEED_SETTLE_SECONDS") or "2")